@@ -1,12 +1,1180 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager, nullcontext
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pydantic import BaseModel, Field, field_validator
 import yaml
-from kubernetes import client, config
-from typing import Any, Dict
-import subprocess
+from typing import Any, Dict, List, Literal, Optional, Union
+from datetime import datetime, timezone
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import functools
+import threading
+import weakref
+import hashlib
+import json
+import copy
+import random
+import time
+import os
+import sys
+import uuid
+import queue
+import atexit
+import logging
+import logging.handlers
+import contextvars
+import collections
+import gzip
+import importlib
+import math
+import socket
+
+# OpenTelemetry spans for the agent's own stages when the API is installed
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# zstd response compression when the zstandard package is installed
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Module imported on first attribute access. The Kubernetes client is a large share of the import
+# time and is not needed until the first API call, which happens after the server is listening.
+class LazyModule:
+    def __init__(self, name: str):
+        self._name   = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+
+client            = LazyModule("kubernetes.client")
+config            = LazyModule("kubernetes.config")
+watch             = LazyModule("kubernetes.watch")
+kubernetes_stream = LazyModule("kubernetes.stream")
+httpx             = LazyModule("httpx")
+
+
+# libyaml-backed loader and dumper when PyYAML was built with it, pure Python otherwise
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def load_yaml(stream):
+    with stage("parse"):
+        return yaml.load(stream, Loader=YAML_LOADER)
+
+
+def dump_yaml(document) -> str:
+    with stage("dump"):
+        return yaml.dump(document, Dumper=YAML_DUMPER)
+
+
+# Shared Kubernetes client settings
+K8S_POOL_MAXSIZE          = int(os.getenv("AGENT_K8S_POOL_MAXSIZE", "32"))
+K8S_TOKEN_CHECK_INTERVAL  = float(os.getenv("AGENT_K8S_TOKEN_CHECK_INTERVAL", "10"))
+SERVICE_ACCOUNT_TOKEN     = "/var/run/secrets/kubernetes.io/serviceaccount/token"
+
+# ConfigMap cache settings
+CACHE_WATCH_TIMEOUT       = int(os.getenv("AGENT_CACHE_WATCH_TIMEOUT", "300"))
+CACHE_RETRY_DELAY         = float(os.getenv("AGENT_CACHE_RETRY_DELAY", "1"))
+
+# Conflict retries for ConfigMap writes
+WRITE_MAX_RETRIES         = int(os.getenv("AGENT_WRITE_MAX_RETRIES", "5"))
+WRITE_BACKOFF_BASE        = float(os.getenv("AGENT_WRITE_BACKOFF_BASE", "0.05"))
+WRITE_BACKOFF_MAX         = float(os.getenv("AGENT_WRITE_BACKOFF_MAX", "1"))
+
+# Coalescing of concurrent writes to the same ConfigMap
+COALESCE_WINDOW           = float(os.getenv("AGENT_COALESCE_WINDOW_MS", "10")) / 1000
+COALESCE_MAX_BATCH        = int(os.getenv("AGENT_COALESCE_MAX_BATCH", "100"))
+WRITE_WORKERS             = int(os.getenv("AGENT_WRITE_WORKERS", "8"))
+
+# Pools per operation type
+READ_WORKERS              = int(os.getenv("AGENT_READ_WORKERS", "16"))
+RELOAD_WORKERS            = int(os.getenv("AGENT_RELOAD_WORKERS", "4"))
+RELOAD_TIMEOUT            = float(os.getenv("AGENT_RELOAD_TIMEOUT", "60"))
+
+# Collector reload settings
+COLLECTOR_CONTAINER       = os.getenv("AGENT_COLLECTOR_CONTAINER", "opentelemetrycollector")
+COLLECTOR_RELOAD_URL      = os.getenv("AGENT_COLLECTOR_RELOAD_URL", "")
+RELOAD_FANOUT             = int(os.getenv("AGENT_RELOAD_FANOUT", "8"))
+AUTO_RELOAD_DEBOUNCE      = float(os.getenv("AGENT_AUTO_RELOAD_DEBOUNCE", "2"))
+
+# Bulk operations
+BULK_PARALLELISM          = int(os.getenv("AGENT_BULK_PARALLELISM", "16"))
+
+# Configuration history kept per ConfigMap
+HISTORY_MAX_VERSIONS      = int(os.getenv("AGENT_HISTORY_MAX_VERSIONS", "50"))
+HISTORY_MAX_BYTES         = int(os.getenv("AGENT_HISTORY_MAX_BYTES", str(4 * 1024 * 1024)))
+
+# Collector configurations served by the agent
+TARGETS_FILE              = os.getenv("AGENT_TARGETS_FILE", "")
+TARGETS                   = os.getenv("AGENT_TARGETS", "")
+DEFAULT_CONFIG_KEY        = os.getenv("AGENT_CONFIG_KEY", "collector.yaml")
+DEFAULT_TARGET            = {"name": "default", "namespace": "monitoring", "configmap_name": "collector-config"}
+
+# Leader election between replicas; writes and reloads received by followers are forwarded to the leader
+LEADER_ELECTION           = os.getenv("AGENT_LEADER_ELECTION", "false").lower() in ("1", "true", "yes")
+LEASE_NAME                = os.getenv("AGENT_LEASE_NAME", "agent-api-leader")
+LEASE_NAMESPACE           = os.getenv("AGENT_LEASE_NAMESPACE", os.getenv("POD_NAMESPACE", "monitoring"))
+LEASE_DURATION            = float(os.getenv("AGENT_LEASE_DURATION", "10"))
+LEASE_RENEW_INTERVAL      = float(os.getenv("AGENT_LEASE_RENEW_INTERVAL", "2"))
+POD_NAME                  = os.getenv("POD_NAME", socket.gethostname())
+ADVERTISE_URL             = os.getenv("AGENT_ADVERTISE_URL", f"http://{os.getenv('POD_IP', '127.0.0.1')}:8000")
+FORWARD_TIMEOUT           = float(os.getenv("AGENT_FORWARD_TIMEOUT", "60"))
+LEADER_ADDRESS_ANNOTATION = "plugin-api-otel/leader-url"
+
+# Configuration responses
+COMPRESSION_MIN_SIZE      = int(os.getenv("AGENT_COMPRESSION_MIN_SIZE", "1024"))
+RENDER_CACHE_SIZE         = int(os.getenv("AGENT_RENDER_CACHE_SIZE", "64"))
+DEFAULT_LABEL_SELECTOR    = "app.kubernetes.io/name=opentelemetrycollector"
+
+# Readiness: the API server answered for every target; with AGENT_READY_REQUIRES_TARGETS every ConfigMap target is cached too
+READY_REQUIRES_TARGETS    = os.getenv("AGENT_READY_REQUIRES_TARGETS", "false").lower() in ("1", "true", "yes")
+READY_RETRY_MAX           = 30
+
+# Admission control: token bucket and concurrency cap per endpoint class and ConfigMap (writes) or namespace (reloads)
+RATE_LIMITS               = os.getenv("AGENT_RATE_LIMITS", "")
+DEFAULT_RATE_LIMITS       = {
+    "write":  {"rate": 50.0, "burst": 100, "concurrency": 16, "queue": 64},
+    "reload": {"rate": 1.0, "burst": 20, "concurrency": 2, "queue": 8},
+}
+
+
+# Logging
+LOG_LEVEL                 = os.getenv("AGENT_LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE           = float(os.getenv("AGENT_LOG_SAMPLE_RATE", "0.1"))
+
+# Request ID of the request being served, attached to every log record
+request_id = contextvars.ContextVar("request_id", default=None)
+
+# Marks high-volume success logs, of which only AGENT_LOG_SAMPLE_RATE are kept
+SAMPLED = {"sampled": True}
+
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id", "sampled"}
+
+
+# One JSON object per line; `extra` fields are added as top-level keys
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Drops most records marked as SAMPLED
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return not getattr(record, "sampled", False) or random.random() < self.rate
+
+
+# Queues records for the listener thread, which formats and writes them
+class AsyncLogHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        record.request_id = request_id.get()
+        # Arguments that may change after the call are rendered now, plain values are formatted later
+        if isinstance(record.args, tuple) and not all(isinstance(arg, (str, int, float, bool, type(None))) for arg in record.args):
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+
+_log_listener = None
+
+
+# (Re)configure the agent logger; records queued for a previous configuration are written first
+def configure_logging(level=LOG_LEVEL, sample_rate=LOG_SAMPLE_RATE, stream=None):
+    global _log_listener
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    records = queue.SimpleQueue()
+    handler = AsyncLogHandler(records)
+    handler.addFilter(SamplingFilter(sample_rate))
+
+    logger = logging.getLogger("agent")
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+    stop_logging()
+    _log_listener = logging.handlers.QueueListener(records, output)
+    _log_listener.start()
+
+
+# Flush the queued records
+@atexit.register
+def stop_logging():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+log = logging.getLogger("agent")
+configure_logging()
+
+
+# Agent metrics, exposed on /metrics
+REQUEST_LATENCY = Histogram("agent_request_duration_seconds", "Latency of API requests", ["method", "endpoint", "status"])
+STAGE_LATENCY   = Histogram("agent_stage_duration_seconds", "Latency of each stage of a request", ["stage"],
+                            buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60))
+FORWARDED       = Counter("agent_forwarded_requests", "Requests forwarded to the leader", ["method"])
+CONFLICTS       = Counter("agent_configmap_conflicts", "ConfigMap writes rejected with 409 Conflict")
+RETRIES         = Counter("agent_configmap_retries", "ConfigMap writes retried after a conflict")
+NOOP_WRITES     = Counter("agent_configmap_noop_writes", "ConfigMap writes skipped because nothing changed")
+WRITES          = Counter("agent_configmap_writes", "ConfigMap writes sent to the API server")
+QUEUE_DEPTH     = Gauge("agent_write_queue_depth", "Mutations waiting to be committed")
+ADMISSION_QUEUE = Gauge("agent_admission_queue_depth", "Requests waiting for a concurrency slot", ["kind"])
+IN_FLIGHT       = Gauge("agent_admission_in_flight", "Admitted requests being processed", ["kind"])
+REJECTED        = Counter("agent_admission_rejected", "Requests rejected with 429", ["kind", "reason"])
+TRACER          = trace.get_tracer("plugin-api-otel") if trace is not None else None
+
+
+# Time a stage into STAGE_LATENCY, inside an OpenTelemetry span when tracing is available
+@contextmanager
+def stage(name: str):
+    span = TRACER.start_as_current_span(f"agent.{name}") if TRACER is not None else nullcontext()
+    started = time.perf_counter()
+    try:
+        with span:
+            yield
+    finally:
+        STAGE_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+
+# Load Kubernetes configuration into the given client configuration
+def load_kubernetes_config(configuration):
+    try:
+        # Load in-cluster configuration when running inside the cluster
+        config.load_incluster_config(client_configuration=configuration)
+        return SERVICE_ACCOUNT_TOKEN
+    except config.ConfigException:
+        # Load kubeconfig for external execution
+        config.load_kube_config(client_configuration=configuration)
+        return os.path.expanduser(os.getenv("KUBECONFIG", "~/.kube/config").split(os.pathsep)[0])
+
+
+# Process-wide Kubernetes client: one configuration and one connection pool shared by all requests
+class KubernetesClient:
+    def __init__(self, pool_maxsize=K8S_POOL_MAXSIZE, check_interval=K8S_TOKEN_CHECK_INTERVAL):
+        self.pool_maxsize   = pool_maxsize
+        self.check_interval = check_interval
+        self._lock          = threading.Lock()
+        self._configuration = None
+        self._api_client    = None
+        self._apis          = {}
+        self._credentials   = None
+        self._mtime         = None
+        self._checked_at    = 0.0
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self._credentials).st_mtime
+        except (OSError, TypeError):
+            return None
+
+    def _connect(self):
+        configuration = client.Configuration()
+        self._credentials = load_kubernetes_config(configuration)
+        configuration.connection_pool_maxsize = self.pool_maxsize
+        self._configuration = configuration
+        self._api_client    = client.ApiClient(configuration)
+        self._apis          = {}
+        self._mtime         = self._file_mtime()
+        self._checked_at    = time.monotonic()
+
+    # Reload credentials in place when the token/kubeconfig file was rotated; the pool is kept
+    def _refresh_credentials(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        mtime = self._file_mtime()
+        if mtime != self._mtime:
+            log.info("Kubernetes credentials changed on disk, reloading %s", self._credentials)
+            load_kubernetes_config(self._configuration)
+            self._mtime = mtime
+
+    def start(self):
+        with self._lock:
+            if self._api_client is None:
+                self._connect()
+
+    def api(self, api_class):
+        with self._lock:
+            if self._api_client is None:
+                self._connect()
+            else:
+                self._refresh_credentials()
+            if api_class not in self._apis:
+                self._apis[api_class] = api_class(self._api_client)
+            return self._apis[api_class]
+
+    def core_v1(self):
+        return self.api(client.CoreV1Api)
+
+    def custom_objects(self):
+        return self.api(client.CustomObjectsApi)
+
+    def coordination_v1(self):
+        return self.api(client.CoordinationV1Api)
+
+    # API object with its own ApiClient for websocket calls, which patch the client while streaming
+    def isolated(self, api_class):
+        with self._lock:
+            if self._api_client is None:
+                self._connect()
+            return api_class(client.ApiClient(self._configuration))
+
+    def close(self):
+        with self._lock:
+            if self._api_client is not None:
+                self._api_client.close()
+            self._configuration = None
+            self._api_client    = None
+            self._apis          = {}
+
+
+kube = KubernetesClient()
+
+
+# Cached ConfigMap with its parsed collector configuration
+class CachedConfigMap:
+    def __init__(self, configmap, document):
+        self.configmap        = configmap
+        self.document         = document
+        self.resource_version = configmap.metadata.resource_version
+        self.watch_version    = self.resource_version
+        self.synced_at        = time.monotonic()
+        self.watching         = False
+        self.awaiting_event   = False
+        self._hash            = None
+        self._index           = None
+
+    # Content hash, computed once per cached version
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = config_hash(self.document)
+        return self._hash
+
+    # Component/reference index, built once per cached version or carried over from the write
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = ComponentIndex.build(self.document)
+        return self._index
+
+
+# Informer-style ConfigMap cache: read once, then follow a watch to keep the parsed document current
+class ConfigMapCache:
+    def __init__(self, kube, watch_factory=None, background=True, watch_timeout=CACHE_WATCH_TIMEOUT):
+        self.kube           = kube
+        self.watch_factory  = watch_factory or (lambda: watch.Watch())
+        self.background     = background
+        self.watch_timeout  = watch_timeout
+        self.hits           = 0
+        self.misses         = 0
+        self._lock          = threading.Lock()
+        self._entries       = {}
+        self._watches       = {}
+        self._threads       = {}
+        self._stop          = threading.Event()
+
+    def _read(self, namespace, configmap_name):
+        with stage("k8s_read"):
+            configmap = self.kube.core_v1().read_namespaced_config_map(configmap_name, namespace)
+        return self.store(namespace, configmap_name, configmap)
+
+    # Store a ConfigMap received from the API server (read or replace). An entry stored by the agent's
+    # own write waits for the watch event of that version: events before it are older than the entry.
+    def store(self, namespace, configmap_name, configmap, document=None, index=None, written=False):
+        if document is None:
+            document = load_yaml(configmap.data[config_key(namespace, configmap_name)])
+        entry = CachedConfigMap(configmap, document)
+        entry._index = index
+        entry.awaiting_event = written
+        with self._lock:
+            previous = self._entries.get((namespace, configmap_name))
+            entry.watching = previous.watching if previous is not None else False
+            self._entries[(namespace, configmap_name)] = entry
+        return entry
+
+    # Store a ConfigMap from a watch event, unless the cache already holds this version (the entry and
+    # its index are kept) or holds a write whose own event has not arrived yet (the event is older)
+    def observe(self, namespace, configmap_name, configmap):
+        key = (namespace, configmap_name)
+        version = configmap.metadata.resource_version
+        with self._lock:
+            current = self._entries.get(key)
+            if self._keeps(current, version):
+                return current
+        entry = CachedConfigMap(configmap, load_yaml(configmap.data[config_key(namespace, configmap_name)]))
+        with self._lock:
+            current = self._entries.get(key)
+            if self._keeps(current, version):
+                return current
+            entry.watching = current.watching if current is not None else False
+            self._entries[key] = entry
+        return entry
+
+    # Called with the lock held
+    def _keeps(self, current, version) -> bool:
+        if current is None:
+            return False
+        if current.resource_version == version:
+            current.awaiting_event = False
+            current.watch_version  = version
+            current.synced_at      = time.monotonic()
+            return True
+        return current.awaiting_event
+
+    # Force a read from the API server, e.g. after a write conflict
+    def refresh(self, namespace, configmap_name):
+        return self._read(namespace, configmap_name)
+
+    def invalidate(self, namespace, configmap_name):
+        with self._lock:
+            self._entries.pop((namespace, configmap_name), None)
+
+    # Return the cached entry, reading through the API server on a miss (or None without read_through)
+    def get(self, namespace, configmap_name, read_through=True):
+        key = (namespace, configmap_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.watching:
+                self.hits += 1
+                return entry
+            if not read_through:
+                return None
+            self.misses += 1
+        entry = self._read(namespace, configmap_name)
+        self._follow(key)
+        return entry
+
+    # Copies that a mutator can change without touching the cache, plus the cached entry they came from
+    def get_for_update(self, namespace, configmap_name):
+        entry = self.get(namespace, configmap_name)
+        configmap = copy.copy(entry.configmap)
+        configmap.metadata = copy.copy(entry.configmap.metadata)
+        configmap.metadata.resource_version = entry.resource_version
+        configmap.data = dict(configmap.data)
+        return configmap, copy.deepcopy(entry.document), entry
+
+    def _set_watching(self, key, watching):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.watching = watching
+
+    def _follow(self, key):
+        if not self.background:
+            return
+        with self._lock:
+            thread = self._threads.get(key)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._run, args=(key,), name=f"watch-{key[0]}-{key[1]}", daemon=True)
+            self._threads[key] = thread
+        thread.start()
+
+    def _run(self, key):
+        while not self._stop.is_set():
+            try:
+                self.watch_once(key)
+            except Exception as e:
+                self._set_watching(key, False)
+                if getattr(e, "status", None) == 410:
+                    log.info("Watch on ConfigMap %s/%s expired, relisting", key[0], key[1])
+                else:
+                    log.warning("Watch on ConfigMap %s/%s failed: %s", key[0], key[1], e)
+                    self._stop.wait(CACHE_RETRY_DELAY)
+                try:
+                    self._read(*key)
+                except Exception as e:
+                    log.error("Fail to relist ConfigMap %s/%s: %s", key[0], key[1], e)
+                    self.invalidate(*key)
+                    return
+            if key not in self._entries:
+                return
+
+    # Follow one watch stream from the cached resourceVersion until it times out
+    def watch_once(self, key):
+        namespace, configmap_name = key
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._read(namespace, configmap_name)
+        w = self.watch_factory()
+        with self._lock:
+            self._watches[key] = w
+            # The stream starts after this version, so no event older than a write stored at it can follow
+            current = self._entries.get(key)
+            if current is not None and current.watch_version == entry.watch_version:
+                current.awaiting_event = False
+        self._set_watching(key, True)
+        try:
+            for event in w.stream(self.kube.core_v1().list_namespaced_config_map, namespace,
+                                  field_selector=f"metadata.name={configmap_name}",
+                                  resource_version=entry.watch_version,
+                                  allow_watch_bookmarks=True,
+                                  timeout_seconds=self.watch_timeout):
+                if self._stop.is_set():
+                    w.stop()
+                    break
+                event_type = event['type']
+                if event_type == 'ERROR':
+                    status = event['raw_object'].get('code')
+                    raise client.ApiException(status=status, reason=event['raw_object'].get('message'))
+                if event_type in ('ADDED', 'MODIFIED'):
+                    self.observe(namespace, configmap_name, event['object'])
+                elif event_type == 'DELETED':
+                    self.invalidate(namespace, configmap_name)
+                    w.stop()
+                    break
+                elif event_type == 'BOOKMARK':
+                    with self._lock:
+                        current = self._entries.get(key)
+                        # A bookmark before the event of a write must not move the resume point behind it
+                        if current is not None and not current.awaiting_event:
+                            current.watch_version = event['raw_object']['metadata']['resourceVersion']
+                            current.synced_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._watches.pop(key, None)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "configmaps": [
+                    {
+                        "namespace": namespace,
+                        "configmap_name": configmap_name,
+                        "resource_version": entry.resource_version,
+                        "watching": entry.watching,
+                        "staleness_seconds": round(now - entry.synced_at, 3),
+                    }
+                    for (namespace, configmap_name), entry in self._entries.items()
+                ],
+            }
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            for w in self._watches.values():
+                w.stop()
+            self._entries.clear()
+
+
+cache = ConfigMapCache(kube)
+
+
+# A collector configuration: a key of a ConfigMap, or the config of an OpenTelemetryCollector resource
+class CollectorTarget(BaseModel):
+    name: str
+    namespace: str
+    kind: Literal["configmap", "opentelemetrycollector"] = "configmap"
+    configmap_name: Optional[str] = None
+    key: str = DEFAULT_CONFIG_KEY
+    resource_name: Optional[str] = None
+    api_version: str = "opentelemetry.io/v1beta1"
+    labels: Dict[str, str] = {}
+
+    def describe(self) -> dict:
+        return self.model_dump(exclude_none=True)
+
+
+# Targets from AGENT_TARGETS_FILE (reloaded when the file changes) or AGENT_TARGETS, as a YAML/JSON list.
+# Without either, the single `default` target is monitoring/collector-config.
+class TargetRegistry:
+    def __init__(self, path=TARGETS_FILE, inline=TARGETS, check_interval=K8S_TOKEN_CHECK_INTERVAL):
+        self.path           = path
+        self.inline         = inline
+        self.check_interval = check_interval
+        self._lock          = threading.Lock()
+        self._targets       = None
+        self._keys          = {}
+        self._mtime         = None
+        self._checked_at    = 0.0
+
+    def _load(self):
+        if self.path:
+            with open(self.path) as file:
+                definitions = load_yaml(file)
+        elif self.inline:
+            definitions = load_yaml(self.inline)
+        else:
+            definitions = [DEFAULT_TARGET]
+        if isinstance(definitions, dict):
+            definitions = definitions.get("targets", [])
+        targets = [CollectorTarget(**definition) for definition in definitions or []]
+        names = [target.name for target in targets]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate target names in {names}")
+        for target in targets:
+            if target.kind == "configmap" and target.configmap_name is None:
+                raise ValueError(f"Target '{target.name}' needs 'configmap_name'")
+            if target.kind == "opentelemetrycollector" and target.resource_name is None:
+                raise ValueError(f"Target '{target.name}' needs 'resource_name'")
+        self._targets = targets
+        self._keys = {(target.namespace, target.configmap_name): target.key for target in targets if target.kind == "configmap"}
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def targets(self) -> list:
+        with self._lock:
+            now = time.monotonic()
+            if self._targets is None:
+                self._mtime = self._file_mtime() if self.path else None
+                self._load()
+            elif self.path and now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                mtime = self._file_mtime()
+                if mtime != self._mtime:
+                    log.info("Targets file %s changed, reloading", self.path)
+                    self._mtime = mtime
+                    self._load()
+            return self._targets
+
+    def get(self, name: str) -> CollectorTarget:
+        for target in self.targets():
+            if target.name == name:
+                return target
+        raise HTTPException(status_code=404, detail=f"Unknown target '{name}'")
+
+    def default(self) -> CollectorTarget:
+        targets = self.targets()
+        if not targets:
+            raise HTTPException(status_code=404, detail="No targets configured")
+        return targets[0]
+
+    # Targets whose labels match an equality-based selector: `k=v`, `k!=v`, `k` and `!k`, comma separated
+    def select(self, selector: str) -> list:
+        requirements = [requirement.strip() for requirement in selector.split(",") if requirement.strip()]
+
+        def matches(labels):
+            for requirement in requirements:
+                if "!=" in requirement:
+                    key, value = (part.strip() for part in requirement.split("!=", 1))
+                    if labels.get(key) == value:
+                        return False
+                elif "=" in requirement:
+                    key, value = (part.strip() for part in requirement.replace("==", "=").split("=", 1))
+                    if labels.get(key) != value:
+                        return False
+                elif requirement.startswith("!"):
+                    if requirement[1:].strip() in labels:
+                        return False
+                elif requirement not in labels:
+                    return False
+            return True
+        return [target for target in self.targets() if matches(target.labels)]
+
+    # Data key holding the collector configuration of a ConfigMap
+    def key_for(self, namespace, configmap_name) -> str:
+        self.targets()
+        return self._keys.get((namespace, configmap_name), DEFAULT_CONFIG_KEY)
+
+
+targets = TargetRegistry()
+
+
+# Data key of a ConfigMap's collector configuration
+def config_key(namespace, configmap_name) -> str:
+    return targets.key_for(namespace, configmap_name)
+
+
+# Lease-based leader election. Like client-go, a lease held by another replica is considered expired once
+# its record has not changed for its whole duration as observed locally, so clock skew does not matter.
+class LeaderElector:
+    def __init__(self, kube, enabled=LEADER_ELECTION, name=LEASE_NAME, namespace=LEASE_NAMESPACE, identity=POD_NAME,
+                 address=ADVERTISE_URL, lease_duration=LEASE_DURATION, renew_interval=LEASE_RENEW_INTERVAL):
+        self.kube            = kube
+        self.enabled         = enabled
+        self.name            = name
+        self.namespace       = namespace
+        self.identity        = identity
+        self.address         = address
+        self.lease_duration  = lease_duration
+        self.renew_interval  = renew_interval
+        self.leader_identity = None
+        self.leader_address  = None
+        self._renewed_at     = None
+        self._observed       = None
+        self._observed_at    = 0.0
+        self._stop           = threading.Event()
+        self._thread         = None
+
+    # Without leader election every replica acts as the leader
+    @property
+    def is_leader(self) -> bool:
+        if not self.enabled:
+            return True
+        return (self.leader_identity == self.identity and self._renewed_at is not None
+                and time.monotonic() - self._renewed_at < self.lease_duration)
+
+    def _observe(self, lease):
+        spec = lease.spec
+        record = (spec.holder_identity, str(spec.renew_time), lease.metadata.resource_version)
+        if record != self._observed:
+            self._observed = record
+            self._observed_at = time.monotonic()
+        duration = spec.lease_duration_seconds or self.lease_duration
+        return not spec.holder_identity or time.monotonic() - self._observed_at >= duration
+
+    def _set_leader(self, lease, acquired):
+        identity = lease.spec.holder_identity or None
+        if identity != self.leader_identity:
+            log.info("Leader of %s/%s is now %s", self.namespace, self.name, identity)
+        self.leader_identity = identity
+        self.leader_address = (lease.metadata.annotations or {}).get(LEADER_ADDRESS_ANNOTATION) if identity else None
+        if acquired:
+            self._renewed_at = time.monotonic()
+
+    # One round: create, take over or renew the lease if possible; returns whether this replica leads
+    def try_acquire(self) -> bool:
+        api = self.kube.coordination_v1()
+        now = datetime.now(timezone.utc)
+        try:
+            lease = api.read_namespaced_lease(self.name, self.namespace)
+        except client.ApiException as e:
+            if e.status != 404:
+                raise
+            lease = client.V1Lease(
+                metadata=client.V1ObjectMeta(name=self.name, namespace=self.namespace, annotations={LEADER_ADDRESS_ANNOTATION: self.address}),
+                spec=client.V1LeaseSpec(holder_identity=self.identity, lease_duration_seconds=math.ceil(self.lease_duration),
+                                        acquire_time=now, renew_time=now, lease_transitions=0))
+            try:
+                lease = api.create_namespaced_lease(self.namespace, lease)
+            except client.ApiException as e:
+                if e.status == 409:
+                    return False
+                raise
+            self._set_leader(lease, True)
+            return True
+
+        holder = lease.spec.holder_identity
+        if holder != self.identity and not self._observe(lease):
+            self._set_leader(lease, False)
+            return False
+
+        if holder != self.identity:
+            lease.spec.lease_transitions = (lease.spec.lease_transitions or 0) + 1
+            lease.spec.acquire_time = now
+        lease.spec.holder_identity = self.identity
+        lease.spec.renew_time = now
+        lease.spec.lease_duration_seconds = math.ceil(self.lease_duration)
+        lease.metadata.annotations = dict(lease.metadata.annotations or {}, **{LEADER_ADDRESS_ANNOTATION: self.address})
+        try:
+            lease = api.replace_namespaced_lease(self.name, self.namespace, lease)
+        except client.ApiException as e:
+            if e.status == 409:
+                return False
+            raise
+        self._set_leader(lease, True)
+        return True
+
+    # Give the lease up so that another replica takes over without waiting for it to expire
+    def release(self):
+        if not self.enabled or not self.is_leader:
+            return
+        try:
+            api = self.kube.coordination_v1()
+            lease = api.read_namespaced_lease(self.name, self.namespace)
+            if lease.spec.holder_identity == self.identity:
+                lease.spec.holder_identity = None
+                lease.spec.lease_duration_seconds = 1
+                api.replace_namespaced_lease(self.name, self.namespace, lease)
+        except Exception as e:
+            log.warning("Fail to release lease %s/%s: %s", self.namespace, self.name, e)
+        self._renewed_at = None
+        self.leader_identity = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.try_acquire()
+            except Exception as e:
+                log.warning("Leader election on %s/%s failed: %s", self.namespace, self.name, e)
+            self._stop.wait(self.renew_interval)
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.renew_interval)
+        self.release()
+
+    def status(self) -> dict:
+        return {"enabled": self.enabled, "identity": self.identity, "is_leader": self.is_leader,
+                "leader": self.leader_identity, "leader_address": self.leader_address}
+
+
+leader = LeaderElector(kube)
+
+
+# Request over its limits, rejected before any work is done
+class RateLimited(HTTPException):
+    def __init__(self, kind: str, key, reason: str, retry_after: float):
+        super().__init__(status_code=429, headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                         detail={"message": f"Too many {kind} requests for {'/'.join(map(str, key))}", "reason": reason})
+
+
+# Per (kind, key): a token bucket of `rate` requests/s up to `burst`, and at most `concurrency` requests
+# in flight with up to `queue` more waiting for a slot. A zero rate or concurrency disables that limit.
+# Limits come from AGENT_RATE_LIMITS (YAML/JSON, e.g. `{reload: {rate: 1}}`) over DEFAULT_RATE_LIMITS.
+class AdmissionController:
+    def __init__(self, limits=RATE_LIMITS, max_keys=4096):
+        overrides = (load_yaml(limits) if isinstance(limits, str) else limits) or {}
+        self.limits   = {kind: dict(DEFAULT_RATE_LIMITS[kind], **overrides.get(kind, {})) for kind in DEFAULT_RATE_LIMITS}
+        self.max_keys = max_keys
+        self._lock    = threading.Lock()
+        self._buckets = {}   # (kind, key) -> [tokens, updated]
+        self._running = {}   # (kind, key) -> requests holding a slot
+        self._waiting = {}   # (kind, key) -> futures of the requests waiting for a slot
+
+    # Seconds until a token is available, or 0 after taking one
+    def _take_token(self, kind: str, key) -> float:
+        limits = self.limits[kind]
+        if limits["rate"] <= 0:
+            return 0
+        now = time.monotonic()
+        if len(self._buckets) >= self.max_keys:
+            # Buckets that are full again behave like new ones
+            self._buckets = {k: b for k, b in self._buckets.items()
+                             if b[0] + (now - b[1]) * self.limits[k[0]]["rate"] < self.limits[k[0]]["burst"]}
+        tokens, updated = self._buckets.get((kind, key), (limits["burst"], now))
+        tokens = min(limits["burst"], tokens + (now - updated) * limits["rate"])
+        if tokens < 1:
+            self._buckets[(kind, key)] = [tokens, now]
+            return (1 - tokens) / limits["rate"]
+        self._buckets[(kind, key)] = [tokens - 1, now]
+        return 0
+
+    def _release(self, kind: str, key):
+        with self._lock:
+            waiting = self._waiting.get((kind, key))
+            if waiting:
+                # The slot passes straight to the oldest waiter
+                waiter = waiting.popleft()
+                if not waiting:
+                    del self._waiting[(kind, key)]
+                waiter.get_loop().call_soon_threadsafe(self._hand_over, waiter, kind, key)
+                return
+            self._running[(kind, key)] -= 1
+            if not self._running[(kind, key)]:
+                del self._running[(kind, key)]
+
+    def _hand_over(self, waiter, kind: str, key):
+        if waiter.done():
+            self._release(kind, key)
+        else:
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, kind: str, key):
+        limits = self.limits[kind]
+        waiter = None
+        with self._lock:
+            retry_after = self._take_token(kind, key)
+            if retry_after:
+                REJECTED.labels(kind, "rate").inc()
+                raise RateLimited(kind, key, "rate", retry_after)
+            if limits["concurrency"] > 0 and self._running.get((kind, key), 0) >= limits["concurrency"]:
+                waiting = self._waiting.setdefault((kind, key), collections.deque())
+                if len(waiting) >= limits["queue"]:
+                    if not waiting:
+                        del self._waiting[(kind, key)]
+                    REJECTED.labels(kind, "concurrency").inc()
+                    raise RateLimited(kind, key, "concurrency", 1 / limits["rate"] if limits["rate"] > 0 else 1)
+                waiter = asyncio.get_running_loop().create_future()
+                waiting.append(waiter)
+            else:
+                self._running[(kind, key)] = self._running.get((kind, key), 0) + 1
+        if waiter is not None:
+            ADMISSION_QUEUE.labels(kind).inc()
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    waiting = self._waiting.get((kind, key))
+                    queued = waiting is not None and waiter in waiting
+                    if queued:
+                        waiting.remove(waiter)
+                        if not waiting:
+                            del self._waiting[(kind, key)]
+                # A slot handed over just before the cancellation is given back
+                if not queued and waiter.done() and not waiter.cancelled():
+                    self._release(kind, key)
+                raise
+            finally:
+                ADMISSION_QUEUE.labels(kind).dec()
+        IN_FLIGHT.labels(kind).inc()
+        try:
+            yield
+        finally:
+            IN_FLIGHT.labels(kind).dec()
+            self._release(kind, key)
+
+    # Admission under every key, taken in sorted order so that overlapping sets cannot deadlock
+    @asynccontextmanager
+    async def admit_all(self, kind: str, keys):
+        async with AsyncExitStack() as admitted:
+            for key in sorted(set(keys), key=str):
+                await admitted.enter_async_context(self.admit(kind, key))
+            yield
+
+
+admission = AdmissionController()
+
+
+# Startup work done after the server is listening: connect the Kubernetes client (importing it), then
+# read the ConfigMap targets into the cache. /ready reports 503 until the API server has answered for
+# every target. A target the API server rejects (missing, forbidden) is reported per target and only
+# blocks readiness when `strict` is set; connection and server errors are retried.
+class Readiness:
+    def __init__(self, kube, cache, targets, strict=READY_REQUIRES_TARGETS, retry_delay=CACHE_RETRY_DELAY):
+        self.kube          = kube
+        self.cache         = cache
+        self.targets       = targets
+        self.strict        = strict
+        self.retry_delay   = retry_delay
+        self.error         = None
+        self.target_errors = {}
+        self.warm_ms       = None
+        self._ready        = threading.Event()
+        self._stop         = threading.Event()
+        self._thread       = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    # A client error other than timeout/throttling is the API server's final answer for a target
+    @staticmethod
+    def _definitive(e) -> bool:
+        status = getattr(e, "status", None)
+        return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+    # One attempt per ConfigMap target: errors by target name, and the first error that is worth retrying
+    def _warm_targets(self):
+        errors = {}
+        retry = None
+        try:
+            configmaps = [target for target in self.targets.targets() if target.kind == "configmap"]
+        except Exception as e:
+            log.warning("Targets not loaded at startup: %s", e)
+            return {"*": str(e)}, None
+        if not configmaps:
+            # Without ConfigMap targets, one request still checks that the API server answers
+            self.kube.api(client.VersionApi).get_code()
+        for target in configmaps:
+            try:
+                self.cache.get(target.namespace, target.configmap_name)
+            except Exception as e:
+                definitive = self._definitive(e)
+                errors[target.name] = f"{e.status} {e.reason}" if definitive else str(e)
+                if not definitive and retry is None:
+                    retry = errors[target.name]
+                log.warning("Target '%s' (%s/%s) not cached at startup: %s", target.name, target.namespace, target.configmap_name, errors[target.name])
+        return errors, retry
+
+    # Wait before the next attempt and return the doubled delay, so a lasting failure is not logged every second
+    def _wait(self, delay: float) -> float:
+        self._stop.wait(delay)
+        return min(delay * 2, READY_RETRY_MAX)
+
+    def warm_up(self):
+        started = time.perf_counter()
+        delay = self.retry_delay
+        while not self._stop.is_set():
+            try:
+                self.kube.start()
+                self.target_errors, retry = self._warm_targets()
+            except Exception as e:
+                retry = str(e)
+            self.error = retry
+            if retry is not None:
+                log.warning("API server not reachable: %s", retry)
+            elif not (self.strict and self.target_errors):
+                break
+            delay = self._wait(delay)
+        else:
+            return
+        self.warm_ms = round((time.perf_counter() - started) * 1000, 1)
+        self._ready.set()
+        log.info("Agent ready, warmed up in %.1f ms", self.warm_ms)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.warm_up, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "warm_ms": self.warm_ms, "error": self.error, "targets": self.target_errors}
+
+
+readiness = Readiness(kube, cache, targets)
+
+
+# Separate bounded pools per operation type, so a slow class of operations cannot starve the others
+executors = {
+    "read":   ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix="k8s-read"),
+    "reload": ThreadPoolExecutor(max_workers=RELOAD_WORKERS, thread_name_prefix="reload"),
+}
+
+
+# Run a blocking call on the pool for its operation type
+async def run_blocking(kind: str, fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context so logs keep the request ID
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executors[kind], functools.partial(context.run, fn, *args, **kwargs))
+
+
+# Limit of concurrent reload subprocesses, one semaphore per event loop
+_reload_slots = weakref.WeakKeyDictionary()
+
+def __reload_slots():
+    loop = asyncio.get_running_loop()
+    if loop not in _reload_slots:
+        _reload_slots[loop] = asyncio.Semaphore(RELOAD_WORKERS)
+    return _reload_slots[loop]
+
+
+# Warm up the shared Kubernetes client and cache in the background at startup, release them at shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    readiness.start()
+    leader.start()
+    yield
+    readiness.stop()
+    leader.stop()
+    reload_scheduler.close()
+    write_queue.close()
+    cache.close()
+    for executor in executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    kube.close()
+
 
 # Initialize FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+
+# Latency of every request, labelled with the route template rather than the raw path
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "unmatched"
+        REQUEST_LATENCY.labels(request.method, endpoint, str(status)).observe(time.perf_counter() - started)
+
+
+FORWARDED_HEADER = "X-Agent-Forwarded-By"
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "te", "trailer", "upgrade", "host", "content-length"}
+
+
+# Send a request to the leader and stream its response back
+async def forward_request(request: Request, address: str):
+    FORWARDED.labels(request.method).inc()
+    headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS}
+    headers[FORWARDED_HEADER] = leader.identity
+    if request_id.get():
+        headers["X-Request-ID"] = request_id.get()
+    http = httpx.AsyncClient(timeout=FORWARD_TIMEOUT)
+    upstream = http.build_request(request.method, address.rstrip("/") + request.url.path, params=request.query_params,
+                                  content=await request.body(), headers=headers)
+    try:
+        response = await http.send(upstream, stream=True)
+    except httpx.HTTPError as e:
+        await http.aclose()
+        log.error("Fail to forward %s %s to the leader at %s: %s", request.method, request.url.path, address, e)
+        return JSONResponse({"detail": f"Leader at {address} is not reachable"}, status_code=503, headers={"Retry-After": str(math.ceil(leader.renew_interval))})
+
+    async def close():
+        await response.aclose()
+        await http.aclose()
+    # The body is streamed decoded, so the leader's Content-Encoding is dropped
+    return StreamingResponse(response.aiter_bytes(), status_code=response.status_code, background=BackgroundTask(close),
+                             headers={name: value for name, value in response.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS | {"content-encoding"}})
+
+
+# Writes and reloads are only performed by the leader; followers forward them, and the history reads
+# that only the leader can answer, since the history is kept in the memory of the replica that writes
+def __leader_only(request: Request) -> bool:
+    if request.method in ("PUT", "POST", "DELETE", "PATCH"):
+        return request.url.path != "/validate"
+    return request.method == "GET" and request.url.path.startswith("/configurations/history")
+
+
+@app.middleware("http")
+async def forward_to_leader(request: Request, call_next):
+    if leader.is_leader or not __leader_only(request):
+        return await call_next(request)
+    if request.headers.get(FORWARDED_HEADER) or leader.leader_address is None:
+        return JSONResponse({"detail": "No leader available, retry later"}, status_code=503,
+                            headers={"Retry-After": str(math.ceil(leader.renew_interval))})
+    return await forward_request(request, leader.leader_address)
+
+
+# Request ID from X-Request-ID (or a new one) for the logs of the request, plus a sampled access log
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    token = request_id.set(request.headers.get("x-request-id") or uuid.uuid4().hex)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id.get()
+        log.log(logging.INFO if response.status_code < 400 else logging.WARNING, "%s %s %d", request.method, request.url.path, response.status_code,
+                extra={"status": response.status_code, "duration_ms": round((time.perf_counter() - started) * 1000, 1), "sampled": response.status_code < 400})
+        return response
+    finally:
+        request_id.reset(token)
 
 
 class OTELConfiguration(BaseModel):
@@ -16,19 +1184,85 @@ class OTELConfiguration(BaseModel):
     processors: Dict[str, Any]
     exporters: Dict[str, Any]
     service: Dict[str, Any]
+    auto_reload: bool = False
+    reload_label_selector: Optional[str] = None
+    reload_strategy: Literal["kubectl", "exec", "rollout", "http"] = "kubectl"
+    prune_unused: bool = False
+
+    # Collector sections of the request, without the agent's own fields
+    def sections(self):
+        return self.model_dump(include={"receivers", "processors", "exporters", "service"})
     
+class PatchOperation(BaseModel):
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    # JSON Pointer ("/receivers/otlp"), list of keys (["receivers", "otlp/v1.2"]) or dotted path ("receivers.otlp")
+    path: Union[str, List[Union[str, int]]]
+    value: Any = None
+    from_path: Optional[Union[str, List[Union[str, int]]]] = Field(default=None, alias="from")
+
+class OTELPatch(BaseModel):
+    namespace: Any
+    configmap_name: Any
+    operations: List[PatchOperation]
+    auto_reload: bool = False
+    reload_label_selector: Optional[str] = None
+    reload_strategy: Literal["kubectl", "exec", "rollout", "http"] = "kubectl"
+    prune_unused: bool = False
+
+class BulkItem(BaseModel):
+    namespace: Any
+    configmap_name: Any
+    operation: Literal["update", "replace", "remove", "patch"]
+    # Collector sections for update/replace/remove, JSON Patch operations for patch
+    configuration: Optional[Dict[str, Any]] = None
+    operations: Optional[List[PatchOperation]] = None
+    prune_unused: bool = False
+
+class OTELValidate(BulkItem):
+    # Without an operation the current configuration is validated as is
+    operation: Optional[Literal["update", "replace", "remove", "patch"]] = None
+
+class OTELRollback(BaseModel):
+    namespace: str
+    configmap_name: str
+    version: str
+    auto_reload: bool = False
+    reload_label_selector: Optional[str] = None
+    reload_strategy: Literal["kubectl", "exec", "rollout", "http"] = "kubectl"
+
+class OTELBulk(BaseModel):
+    items: List[BulkItem]
+    parallelism: int = Field(default=BULK_PARALLELISM, ge=1)
+    stop_on_failure: bool = False
+    dry_run: bool = False
+
 class OTELReload(BaseModel):
     namespace: Any
     label_selector: Any
+    strategy: Literal["kubectl", "exec", "rollout", "http"] = "kubectl"
+    signal: str = Field(default="HUP", pattern=r"^[A-Z0-9]+$")
+    container: str = COLLECTOR_CONTAINER
+    reload_url: Optional[str] = None
+    reload_port: Optional[int] = Field(default=None, ge=1, le=65535)
+    reload_path: str = Field(default="/", pattern=r"^/[A-Za-z0-9._~/-]*$")
+    fallback: bool = True
+    namespaces: Optional[List[str]] = None
+    max_parallel: int = Field(default=RELOAD_FANOUT, ge=1)
+    pod_timeout: float = Field(default=RELOAD_TIMEOUT, gt=0)
 
-# Load Kubernetes configuration
-def load_kubernetes_config():
-    try:
-        # Load in-cluster configuration when running inside the cluster
-        config.load_incluster_config()
-    except config.ConfigException:
-        # Load kubeconfig for external execution
-        config.load_kube_config()
+    # Any URL would let callers make the agent POST anywhere in the cluster; only port and path on the pod are accepted
+    @field_validator("reload_url")
+    @classmethod
+    def no_reload_url(cls, value):
+        if value is not None:
+            raise ValueError("reload_url is not accepted, use reload_port/reload_path or AGENT_COLLECTOR_RELOAD_URL")
+        return value
+
+    # URL template for the http strategy: on the pod itself when reload_port is given, else AGENT_COLLECTOR_RELOAD_URL
+    def reload_url_template(self) -> Optional[str]:
+        if self.reload_port is None:
+            return None
+        return f"http://{{pod_ip}}:{self.reload_port}{self.reload_path}"
 
 
 # Update receiver structure
@@ -41,39 +1275,65 @@ def __update_configmap(new_configmap: dict, configmap: dict):
             else:
                 configmap[key] = value
     except Exception as e:
-        print(f"Error updating configmap: {e}")
+        log.error("Error updating configmap: %s", e)
         raise HTTPException(status_code=500, detail=f"Fail to update configmap: {e}")
             
-# Delete keys from the configmap 
-def __remove_configmap(keys_to_remove: dict, configmap: dict, path="") -> list:
+# Items of `items` that are not in `remove`, with hashed lookups for hashable items
+def __without_items(items: list, remove: list) -> list:
+    hashable, unhashable = set(), []
+    for item in remove:
+        try:
+            hashable.add(item)
+        except TypeError:
+            unhashable.append(item)
+
+    if not unhashable:
+        try:
+            return [item for item in items if item not in hashable]
+        except TypeError:
+            pass
+
+    def keep(item):
+        try:
+            return item not in hashable
+        except TypeError:
+            return item not in unhashable
+    return [item for item in items if keep(item)]
+
+
+# Delete keys from the configmap in a single pass; maps and lists left empty are pruned on the way back up.
+# Returns the removed paths as key tuples.
+def __remove_configmap(keys_to_remove: dict, configmap: dict, path=()) -> list:
     try:
         removed_paths = []
 
         for key, value in keys_to_remove.items():
-            current_path = f"{path}.{key}" if path else key
-
-            if key in configmap:
-                if isinstance(value, dict) and isinstance(configmap[key], dict):
-                    sub_removed = __remove_configmap(value, configmap[key], current_path)
-                    removed_paths.extend(sub_removed)
+            if key not in configmap:
+                continue
+            current = configmap[key]
+            current_path = path + (key,)
 
-                    if not configmap[key]:  # Subestructura vacía
-                        del configmap[key]
-                        removed_paths.append(current_path)
-
-                elif isinstance(value, list) and isinstance(configmap[key], list):
-                    configmap[key] = [item for item in configmap[key] if item not in value]
-                    if not configmap[key]:
-                        del configmap[key]
-                        removed_paths.append(current_path)
+            if isinstance(value, dict) and isinstance(current, dict):
+                removed_paths.extend(__remove_configmap(value, current, current_path))
+                if not current:  # Subestructura vacía
+                    del configmap[key]
+                    removed_paths.append(current_path)
 
-                elif configmap[key] == value:
+            elif isinstance(value, list) and isinstance(current, list):
+                remaining = __without_items(current, value)
+                if remaining:
+                    configmap[key] = remaining
+                else:
                     del configmap[key]
                     removed_paths.append(current_path)
 
+            elif current == value:
+                del configmap[key]
+                removed_paths.append(current_path)
+
         return removed_paths
     except Exception as e:
-        print(f"Error updating configmap: {e}")
+        log.error("Error updating configmap: %s", e)
         raise HTTPException(status_code=500, detail=f"Fail to delete key from configmap: {e}")
 
 
@@ -81,46 +1341,473 @@ def __remove_configmap(keys_to_remove: dict, configmap: dict, path="") -> list:
 def __load_test_configmap():
     with open("test/template.yaml") as file:
         try:
-            return yaml.safe_load(file) 
+            return load_yaml(file) 
         except yaml.YAMLError as exc:
-            print(exc)
-            
-def __clean_removed_paths(configmap_yaml: dict, removed_paths: list):
-    for path in removed_paths:
-        keys = path.split(".")
-        parent = configmap_yaml
+            log.error("Invalid test ConfigMap template: %s", exc)
 
-        for k in keys[:-1]:
-            parent = parent.get(k, {})
-            if not isinstance(parent, dict):
-                break 
 
-        last = keys[-1]
-        if isinstance(parent, dict) and last in parent:
-            if isinstance(parent[last], dict) and not parent[last]:
-                del parent[last]
-            elif isinstance(parent[last], list) and not parent[last]:
-                del parent[last]
 
 
+# Test ConfigMap used in DEBUG mode, parsed once
+@functools.lru_cache(maxsize=1)
+def __debug_template():
+    return load_yaml(__load_test_configmap()['data']['collector.yaml'])
 
 
-# Update the ConfigMap with the new pipeline configuration
-def update_configmap(namespace: str, configmap_name: str, new_pipeline: dict):
+# Load the test ConfigMap used in DEBUG mode
+def __load_debug_configmap():
+    log.debug("No Kubeconfig, entering DEBUG mode")
+    configmap_yaml = copy.deepcopy(__debug_template())
+    log.debug("TESTING: %s", configmap_yaml)
+    return configmap_yaml
+
+
+# Hash of the canonicalized collector configuration
+def config_hash(configmap_yaml) -> str:
+    canonical = json.dumps(configmap_yaml, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# Structural diff between two configurations: added, changed and removed key paths
+def diff_configmap(before, after, path=(), diff=None) -> dict:
+    if diff is None:
+        diff = {"added": [], "changed": [], "removed": []}
+    for key, value in after.items():
+        current_path = path + (key,)
+        if key not in before:
+            diff["added"].append(list(current_path))
+        elif isinstance(value, dict) and isinstance(before[key], dict):
+            diff_configmap(before[key], value, current_path, diff)
+        elif value != before[key]:
+            diff["changed"].append(list(current_path))
+    for key in before:
+        if key not in after:
+            diff["removed"].append(list(path + (key,)))
+    return diff
+
+
+def __is_empty_diff(diff: dict) -> bool:
+    return not (diff["added"] or diff["changed"] or diff["removed"])
+
+
+COMPONENT_SECTIONS  = ("receivers", "processors", "exporters", "connectors", "extensions")
+PIPELINE_SECTIONS   = ("receivers", "processors", "exporters")
+
+
+# Components defined in a configuration and the pipelines/extensions referencing them.
+# `updated` re-indexes only what a diff touched, so validation stays cheap on large configurations.
+class ComponentIndex:
+    def __init__(self):
+        self.defined    = {section: set() for section in COMPONENT_SECTIONS}
+        self.pipelines  = {}
+        self.extensions = []
+
+    @classmethod
+    def build(cls, configmap_yaml: dict):
+        index = cls()
+        for section in COMPONENT_SECTIONS:
+            index._index_section(configmap_yaml, section)
+        index._index_service(configmap_yaml)
+        return index
+
+    @staticmethod
+    def _mapping(value):
+        return value if isinstance(value, dict) else {}
+
+    def _service(self, configmap_yaml):
+        return self._mapping(configmap_yaml.get("service"))
+
+    def _index_section(self, configmap_yaml, section):
+        self.defined[section] = set(self._mapping(configmap_yaml.get(section)))
+
+    def _index_component(self, configmap_yaml, section, name):
+        if name in self._mapping(configmap_yaml.get(section)):
+            self.defined[section].add(name)
+        else:
+            self.defined[section].discard(name)
+
+    def _index_pipeline(self, configmap_yaml, name):
+        pipeline = self._mapping(self._service(configmap_yaml).get("pipelines")).get(name)
+        if not isinstance(pipeline, dict):
+            self.pipelines.pop(name, None)
+            return
+        self.pipelines[name] = {section: list(pipeline.get(section) or []) for section in PIPELINE_SECTIONS}
+
+    def _index_pipelines(self, configmap_yaml):
+        self.pipelines = {}
+        for name in self._mapping(self._service(configmap_yaml).get("pipelines")):
+            self._index_pipeline(configmap_yaml, name)
+
+    def _index_extensions(self, configmap_yaml):
+        self.extensions = list(self._service(configmap_yaml).get("extensions") or [])
+
+    def _index_service(self, configmap_yaml):
+        self._index_pipelines(configmap_yaml)
+        self._index_extensions(configmap_yaml)
+
+    def copy(self):
+        index = ComponentIndex()
+        index.defined    = {section: set(names) for section, names in self.defined.items()}
+        index.pipelines  = dict(self.pipelines)
+        index.extensions = list(self.extensions)
+        return index
+
+    # Index of `configmap_yaml`, derived from this one and the diff that produced it
+    def updated(self, configmap_yaml: dict, diff: dict):
+        index = self.copy()
+        for path in diff["added"] + diff["changed"] + diff["removed"]:
+            head = path[0]
+            if head in COMPONENT_SECTIONS:
+                if len(path) == 1:
+                    index._index_section(configmap_yaml, head)
+                else:
+                    index._index_component(configmap_yaml, head, path[1])
+            elif head == "service":
+                if len(path) == 1:
+                    index._index_service(configmap_yaml)
+                elif path[1] == "pipelines":
+                    if len(path) == 2:
+                        index._index_pipelines(configmap_yaml)
+                    else:
+                        index._index_pipeline(configmap_yaml, path[2])
+                elif path[1] == "extensions":
+                    index._index_extensions(configmap_yaml)
+        return index
+
+    def _is_defined(self, section, name):
+        if name in self.defined[section]:
+            return True
+        # Connectors act as exporter of one pipeline and receiver of another
+        return section in ("receivers", "exporters") and name in self.defined["connectors"]
+
+    # References to components that are not defined
+    def dangling(self) -> list:
+        problems = []
+        for pipeline, sections in self.pipelines.items():
+            for section, names in sections.items():
+                for name in names:
+                    if not self._is_defined(section, name):
+                        problems.append({"pipeline": pipeline, "section": section, "component": name})
+        for name in self.extensions:
+            if name not in self.defined["extensions"]:
+                problems.append({"pipeline": None, "section": "extensions", "component": name})
+        return problems
+
+    # Defined components that no pipeline or service.extensions references
+    def unused(self) -> list:
+        referenced = {section: set() for section in COMPONENT_SECTIONS}
+        for sections in self.pipelines.values():
+            for section, names in sections.items():
+                referenced[section].update(names)
+                if section != "processors":
+                    referenced["connectors"].update(names)
+        referenced["extensions"].update(self.extensions)
+        return [[section, name] for section in COMPONENT_SECTIONS for name in sorted(self.defined[section] - referenced[section])]
+
+
+# Rejected change: it would leave pipelines referencing undefined components
+class ValidationFailed(HTTPException):
+    def __init__(self, problems: list):
+        super().__init__(status_code=422, detail={"message": "Configuration references undefined components", "dangling": problems})
+
+
+# Problems introduced by a change; references that were already dangling before do not block it
+def new_dangling_references(before: ComponentIndex, after: ComponentIndex) -> list:
+    existing = {(problem["pipeline"], problem["section"], problem["component"]) for problem in before.dangling()}
+    return [problem for problem in after.dangling() if (problem["pipeline"], problem["section"], problem["component"]) not in existing]
+
+
+# Operations turning `source` into `target`: ["set", path, value] or ["delete", path]
+def configuration_delta(source: dict, target: dict) -> list:
+    diff = diff_configmap(source, target)
+    delta = []
+    for path in diff["added"] + diff["changed"]:
+        value = target
+        for key in path:
+            value = value[key]
+        delta.append(["set", path, copy.deepcopy(value)])
+    for path in diff["removed"]:
+        delta.append(["delete", path])
+    return delta
+
+
+# Apply a delta from `configuration_delta` in place
+def apply_delta(document: dict, delta: list) -> dict:
+    for operation in delta:
+        *parents, key = operation[1]
+        parent = document
+        for name in parents:
+            parent = parent[name]
+        if operation[0] == "set":
+            parent[key] = copy.deepcopy(operation[2])
+        else:
+            del parent[key]
+    return document
+
+
+# One committed version; only the newest keeps its document, older ones keep the delta from their successor
+class ConfigurationVersion:
+    def __init__(self, hash, size):
+        self.hash       = hash
+        self.size       = size
+        self.delta      = None
+        self.created_at = datetime.now(timezone.utc).isoformat()
+
+
+# Bounded, delta-encoded history of the configurations written to each ConfigMap, addressed by content hash
+class ConfigurationHistory:
+    def __init__(self, max_versions=HISTORY_MAX_VERSIONS, max_bytes=HISTORY_MAX_BYTES):
+        self.max_versions = max_versions
+        self.max_bytes    = max_bytes
+        self._versions    = {}
+        self._heads       = {}
+        self._lock        = threading.Lock()
+
+    @staticmethod
+    def _size(value):
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+
+    def _push(self, key, document, hash):
+        versions = self._versions.setdefault(key, [])
+        if versions:
+            # The previous head becomes a delta from the new document
+            previous = versions[-1]
+            previous.delta = configuration_delta(document, self._heads[key])
+            previous.size = self._size(previous.delta)
+        versions.append(ConfigurationVersion(hash, self._size(document)))
+        self._heads[key] = document
+
+    def _evict(self, key):
+        versions = self._versions[key]
+        while len(versions) > 1 and (len(versions) > self.max_versions or sum(version.size for version in versions) > self.max_bytes):
+            versions.pop(0)
+
+    # Record a write from `before` to `after`; `before` is added first if it was changed outside the agent
+    def record(self, namespace, configmap_name, before, before_hash, after, after_hash):
+        key = (namespace, configmap_name)
+        with self._lock:
+            versions = self._versions.get(key)
+            if not versions or versions[-1].hash != before_hash:
+                self._push(key, before, before_hash)
+            self._push(key, after, after_hash)
+            self._evict(key)
+
+    # Versions, newest first
+    def versions(self, namespace, configmap_name) -> list:
+        with self._lock:
+            versions = list(self._versions.get((namespace, configmap_name), []))
+        return [{"version": version.hash, "created_at": version.created_at, "size": version.size, "current": i == 0}
+                for i, version in enumerate(reversed(versions))]
+
+    # Full hash of the newest version matching a hash or unique hash prefix
+    def resolve(self, namespace, configmap_name, version: str) -> str:
+        with self._lock:
+            hashes = [entry.hash for entry in self._versions.get((namespace, configmap_name), [])]
+        matches = {hash for hash in hashes if hash.startswith(version)}
+        if not matches:
+            raise HTTPException(status_code=404, detail=f"Version {version} not found for {namespace}/{configmap_name}")
+        if len(matches) > 1:
+            raise HTTPException(status_code=422, detail=f"Version prefix {version} is ambiguous")
+        return matches.pop()
+
+    # Rebuild a version from the newest document and the deltas in between
+    def document(self, namespace, configmap_name, version: str) -> dict:
+        hash = self.resolve(namespace, configmap_name, version)
+        key = (namespace, configmap_name)
+        with self._lock:
+            versions = self._versions[key]
+            document = copy.deepcopy(self._heads[key])
+            if versions[-1].hash != hash:
+                for entry in reversed(versions[:-1]):
+                    apply_delta(document, entry.delta)
+                    if entry.hash == hash:
+                        break
+        return document
+
+
+history = ConfigurationHistory()
+
+
+# Remove components that nothing references
+def prune_unused_components(configmap_yaml: dict) -> list:
+    unused = ComponentIndex.build(configmap_yaml).unused()
+    for section, name in unused:
+        del configmap_yaml[section][name]
+    return unused
+
+
+# Jittered exponential backoff before retrying a conflicting write
+def __conflict_backoff(attempt: int):
+    time.sleep(random.uniform(0, min(WRITE_BACKOFF_MAX, WRITE_BACKOFF_BASE * (2 ** attempt))))
+
+
+# Read-modify-write a ConfigMap. The replace is conditional on the resourceVersion that was read;
+# on 409 Conflict the ConfigMap is re-fetched and the same mutation applied again.
+def commit_configmap(namespace: str, configmap_name: str, mutate):
     try:
-        load_kubernetes_config()
-        v1 = client.CoreV1Api()
-        # Retrieve the current ConfigMap
-        configmap           = v1.read_namespaced_config_map(configmap_name, namespace)
-        configmap_yaml      = yaml.safe_load(configmap.data['collector.yaml'])
+        v1 = kube.core_v1()
+        # Start from the cached ConfigMap
+        configmap, configmap_yaml, base = cache.get_for_update(namespace, configmap_name)
     except Exception as e:
-        if configmap_name is None:
-            print("No Kubeconfig, entering DEBUG mode")
-            configmap_yaml = yaml.safe_load(__load_test_configmap()['data']['collector.yaml'])
-            print(f"TESTING: {configmap_yaml}")
+        raise HTTPException(status_code=500, detail=f"Fail to load Kubeconfig: {e}")
+
+    retries = 0
+    while True:
+        configmap_yaml = mutate(configmap_yaml)
+
+        # Nothing changed: skip the write and the watch events/volume refresh it would cause
+        diff = diff_configmap(base.document, configmap_yaml)
+        if __is_empty_diff(diff):
+            NOOP_WRITES.inc()
+            return {"configmap": base.configmap, "retries": retries, "written": False, "diff": diff,
+                    "previous_hash": base.hash, "hash": base.hash}
+
+        # Reject changes that leave pipelines pointing at undefined components
+        with stage("validate"):
+            index = base.index.updated(configmap_yaml, diff)
+            problems = new_dangling_references(base.index, index)
+        if problems:
+            raise ValidationFailed(problems)
+        try:
+            updated_yaml = dump_yaml(configmap_yaml)
+            configmap.data[config_key(namespace, configmap_name)] = updated_yaml
+            WRITES.inc()
+            with stage("k8s_write"):
+                configmap = v1.replace_namespaced_config_map(configmap_name, namespace, configmap)
+            entry = cache.store(namespace, configmap_name, configmap, configmap_yaml, index, written=True)
+        except Exception as e:
+            if getattr(e, "status", None) != 409:
+                raise HTTPException(status_code=500, detail=f"Fail to replace configmap: {e}")
+            CONFLICTS.inc()
+            if retries >= WRITE_MAX_RETRIES:
+                raise HTTPException(status_code=409, detail=f"ConfigMap {namespace}/{configmap_name} changed concurrently, gave up after {retries} retries")
         else:
-            raise HTTPException(status_code=500, detail=f"Fail to load Kubeconfig: {e}")
+            history.record(namespace, configmap_name, base.document, base.hash, entry.document, entry.hash)
+            return {"configmap": configmap, "retries": retries, "written": True, "diff": diff,
+                    "previous_hash": base.hash, "hash": entry.hash}
+
+        retries += 1
+        RETRIES.inc()
+        log.warning("Conflict writing ConfigMap %s/%s, retry %d", namespace, configmap_name, retries)
+        __conflict_backoff(retries)
+        try:
+            cache.refresh(namespace, configmap_name)
+            configmap, configmap_yaml, base = cache.get_for_update(namespace, configmap_name)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Fail to re-read configmap: {e}")
+
 
+# Raised when every mutation of a batch failed, so there is nothing to write
+class EmptyBatch(Exception):
+    pass
+
+
+# Per-ConfigMap write queue: mutations arriving within a short window are applied in order
+# to one parsed document and committed with a single replace
+class ConfigMapWriteQueue:
+    def __init__(self, window=COALESCE_WINDOW, max_batch=COALESCE_MAX_BATCH, workers=WRITE_WORKERS):
+        self.window     = window
+        self.max_batch  = max_batch
+        self._lock      = threading.Lock()
+        self._pending   = {}
+        self._flushing  = set()
+        self._executor  = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="configmap-writer")
+
+    def submit(self, namespace: str, configmap_name: str, mutate) -> Future:
+        key = (namespace, configmap_name)
+        future = Future()
+        with self._lock:
+            # The caller's context goes with the mutation so that write-path logs keep its request_id
+            self._pending.setdefault(key, []).append((mutate, future, contextvars.copy_context()))
+            if key in self._flushing:
+                return future
+            self._flushing.add(key)
+        self._executor.submit(self._flush, key)
+        return future
+
+    def pending(self):
+        with self._lock:
+            return sum(len(batch) for batch in self._pending.values())
+
+    def _flush(self, key):
+        while True:
+            time.sleep(self.window)
+            with self._lock:
+                queued = self._pending.pop(key, [])
+                batch, rest = queued[:self.max_batch], queued[self.max_batch:]
+                if rest:
+                    self._pending[key] = rest
+                if not batch:
+                    self._flushing.discard(key)
+                    return
+            self._commit(key, batch)
+
+    def _commit(self, key, batch):
+        errors = {}
+        diffs = {}
+
+        # Apply every queued mutation in order. With several mutations each one starts from a snapshot,
+        # which gives its own diff and lets a failing mutation be dropped without affecting the others.
+        def apply_batch(configmap_yaml: dict):
+            errors.clear()
+            diffs.clear()
+            for i, (mutate, _, context) in enumerate(batch):
+                snapshot = copy.deepcopy(configmap_yaml) if len(batch) > 1 else None
+                try:
+                    configmap_yaml = context.run(mutate, configmap_yaml)
+                    if snapshot is not None:
+                        diffs[i] = diff_configmap(snapshot, configmap_yaml)
+                except Exception as e:
+                    errors[i] = e
+                    if snapshot is None:
+                        break
+                    configmap_yaml = snapshot
+            if len(errors) == len(batch):
+                raise EmptyBatch()
+            return configmap_yaml
+
+        # Logs of the shared commit carry the request IDs of the whole batch
+        batch_context = contextvars.copy_context()
+        batch_ids = dict.fromkeys(context.get(request_id) for _, _, context in batch if context.get(request_id))
+        batch_context.run(request_id.set, ",".join(batch_ids) or None)
+
+        try:
+            result = batch_context.run(commit_configmap, key[0], key[1], apply_batch)
+            result["batch_size"] = len(batch)
+        except EmptyBatch:
+            result = None
+        except ValidationFailed as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # Commit one by one so that only the invalid changes are rejected
+            for mutate, future, context in batch:
+                try:
+                    future.set_result(dict(context.run(commit_configmap, key[0], key[1], mutate), batch_size=1))
+                except Exception as error:
+                    future.set_exception(error)
+            return
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for i, (_, future, _) in enumerate(batch):
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(dict(result, diff=diffs.get(i, result["diff"])))
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+write_queue = ConfigMapWriteQueue()
+QUEUE_DEPTH.set_function(lambda: write_queue.pending())
+
+
+# Merge the new sections into the current configuration (PUT)
+def __merge_mutation(new_pipeline: dict):
     # Extract pipeline details
     receiver    = new_pipeline['receivers']  if 'receivers' in new_pipeline else None
     processor   = new_pipeline['processors'] if 'processors' in new_pipeline else None 
@@ -128,67 +1815,29 @@ def update_configmap(namespace: str, configmap_name: str, new_pipeline: dict):
     service     = new_pipeline['service']    if 'service' in new_pipeline else None
     
     updates_new_configmaps = [(receiver, 'receivers'), (processor, 'processors'), (exporter, 'exporters'), (service, 'service')]
-    for new_configmap in updates_new_configmaps:
-        __update_configmap(new_configmap[0], configmap_yaml[new_configmap[1]])
-    if configmap_name is not None:
-        try:
-            updated_yaml = yaml.safe_dump(configmap_yaml)
-            configmap.data['collector.yaml'] = updated_yaml
-            v1.replace_namespaced_config_map(configmap_name, namespace, configmap)
-            return configmap
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Fail to replace configmap: {e}")
-    else:
-        return configmap_yaml
-        
-        
-        
-        
-def add_configmap(namespace: str, configmap_name: str, new_configmap: dict):
-    try:
-        load_kubernetes_config()
-        v1 = client.CoreV1Api()
-        # Retrieve the current ConfigMap
-        configmap           = v1.read_namespaced_config_map(configmap_name, namespace)
-        configmap_yaml      = yaml.safe_load(configmap.data['collector.yaml'])
-    except Exception as e:
-        if configmap_name is None:
-            print("No Kubeconfig, entering DEBUG mode")
-            configmap_yaml = yaml.safe_load(__load_test_configmap()['data']['collector.yaml'])
-            print(f"TESTING: {configmap_yaml}")
-            configmap_yaml = new_configmap
-            return configmap_yaml
-        else:
-            raise HTTPException(status_code=500, detail=f"Fail to load Kubeconfig: {e}")
 
-    if configmap_name is not None:
-        try:
-            updated_yaml = yaml.safe_dump(new_configmap)
-            configmap.data['collector.yaml'] = updated_yaml
-            v1.replace_namespaced_config_map(configmap_name, namespace, configmap)
-            return configmap
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Fail to replace configmap: {e}")
-    else:
+    def merge(configmap_yaml: dict):
+        for new_configmap in updates_new_configmaps:
+            __update_configmap(new_configmap[0], configmap_yaml[new_configmap[1]])
         return configmap_yaml
+    return __staged("merge", merge)
+
+
+# Time a mutation as a stage of the request
+def __staged(name: str, mutate):
+    def apply(configmap_yaml: dict):
+        with stage(name):
+            return mutate(configmap_yaml)
+    return apply
 
-        
-        
-def remove_configmap(namespace: str, configmap_name: str, remove_pipeline: dict):
-    try:
-        load_kubernetes_config()
-        v1 = client.CoreV1Api()
-        # Retrieve the current ConfigMap
-        configmap           = v1.read_namespaced_config_map(configmap_name, namespace)
-        configmap_yaml      = yaml.safe_load(configmap.data['collector.yaml'])
-    except Exception as e:
-        if configmap_name is None:
-            print("No Kubeconfig, entering DEBUG mode")
-            configmap_yaml = yaml.safe_load(__load_test_configmap()['data']['collector.yaml'])
-            print(f"TESTING: {configmap_yaml}")
-        else:
-            raise HTTPException(status_code=500, detail=f"Fail to load Kubeconfig: {e}")
 
+# Replace the whole configuration (POST)
+def __replace_mutation(new_configmap: dict):
+    return lambda configmap_yaml: copy.deepcopy(new_configmap)
+
+
+# Remove sections from the current configuration (DELETE)
+def __remove_mutation(remove_pipeline: dict):
     # Extract pipeline details
     receiver    = remove_pipeline['receivers']  if 'receivers' in remove_pipeline else dict()
     processor   = remove_pipeline['processors'] if 'processors' in remove_pipeline else dict()
@@ -196,161 +1845,822 @@ def remove_configmap(namespace: str, configmap_name: str, remove_pipeline: dict)
     service     = remove_pipeline['service']    if 'service' in remove_pipeline else dict()
     
     update_remove_configmaps = [(receiver, 'receivers'), (processor, 'processors'), (exporter, 'exporters'), (service, 'service')]
-    removed_paths = []
-    for new_configmap in update_remove_configmaps:
-            removed = __remove_configmap(new_configmap[0], configmap_yaml[new_configmap[1]], new_configmap[1])
-            removed_paths.extend(removed)
 
-    __clean_removed_paths(configmap_yaml, removed_paths)
-    if configmap_name is not None:
+    def remove(configmap_yaml: dict):
+        for new_configmap in update_remove_configmaps:
+            __remove_configmap(new_configmap[0], configmap_yaml[new_configmap[1]], (new_configmap[1],))
+        return configmap_yaml
+    return __staged("remove", remove)
+
+
+# Split a patch path into keys: JSON Pointer (RFC 6901), list of keys or dotted path
+def __patch_path(path) -> list:
+    if isinstance(path, list):
+        return path
+    if path == "":
+        return []
+    if path.startswith("/"):
+        return [key.replace("~1", "/").replace("~0", "~") for key in path[1:].split("/")]
+    return path.split(".")
+
+
+# Resolve the container holding the last key of a path, and that key
+def __patch_parent(configmap_yaml, keys: list, path):
+    if not keys:
+        raise HTTPException(status_code=422, detail=f"Path {path!r} addresses the whole document")
+    parent = configmap_yaml
+    for key in keys[:-1]:
         try:
-            updated_yaml = yaml.safe_dump(configmap_yaml)
-            configmap.data['collector.yaml'] = updated_yaml
-            v1.replace_namespaced_config_map(configmap_name, namespace, configmap)
-            return configmap
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Fail to replace configmap: {e}")
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise HTTPException(status_code=422, detail=f"Path {path!r} does not exist")
+    last = keys[-1]
+    if isinstance(parent, list):
+        if last == "-":
+            return parent, len(parent)
+        try:
+            last = int(last)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Path {path!r} does not address a list index")
+    elif not isinstance(parent, dict):
+        raise HTTPException(status_code=422, detail=f"Path {path!r} does not exist")
+    return parent, last
+
+
+def __patch_get(configmap_yaml, path):
+    parent, key = __patch_parent(configmap_yaml, __patch_path(path), path)
+    try:
+        return parent[key]
+    except (KeyError, IndexError):
+        raise HTTPException(status_code=422, detail=f"Path {path!r} does not exist")
+
+
+def __patch_add(configmap_yaml, path, value):
+    parent, key = __patch_parent(configmap_yaml, __patch_path(path), path)
+    if isinstance(parent, list):
+        if not 0 <= key <= len(parent):
+            raise HTTPException(status_code=422, detail=f"Index in {path!r} is out of range")
+        parent.insert(key, value)
     else:
+        parent[key] = value
+
+
+def __patch_remove(configmap_yaml, path):
+    parent, key = __patch_parent(configmap_yaml, __patch_path(path), path)
+    try:
+        return parent.pop(key)
+    except (KeyError, IndexError):
+        raise HTTPException(status_code=422, detail=f"Path {path!r} does not exist")
+
+
+# Apply JSON Patch style operations directly to the parsed configuration (PATCH)
+def __patch_mutation(operations: list):
+    def apply(configmap_yaml: dict):
+        for operation in operations:
+            if operation.op == "add":
+                __patch_add(configmap_yaml, operation.path, copy.deepcopy(operation.value))
+            elif operation.op == "remove":
+                __patch_remove(configmap_yaml, operation.path)
+            elif operation.op == "replace":
+                __patch_get(configmap_yaml, operation.path)
+                parent, key = __patch_parent(configmap_yaml, __patch_path(operation.path), operation.path)
+                parent[key] = copy.deepcopy(operation.value)
+            elif operation.op == "move":
+                value = __patch_remove(configmap_yaml, operation.from_path)
+                __patch_add(configmap_yaml, operation.path, value)
+            elif operation.op == "copy":
+                __patch_add(configmap_yaml, operation.path, copy.deepcopy(__patch_get(configmap_yaml, operation.from_path)))
+            elif operation.op == "test":
+                if __patch_get(configmap_yaml, operation.path) != operation.value:
+                    raise HTTPException(status_code=409, detail=f"Test failed: value at {operation.path!r} differs")
         return configmap_yaml
+    return __staged("patch", apply)
+
+
+# Optionally drop components left unreferenced by a mutation
+def __with_pruning(mutate, prune_unused: bool):
+    if not prune_unused:
+        return mutate
+
+    def apply(configmap_yaml: dict):
+        configmap_yaml = mutate(configmap_yaml)
+        prune_unused_components(configmap_yaml)
+        return configmap_yaml
+    return apply
+
+
+# Mutation for one item of a bulk request
+def __bulk_mutation(item: BulkItem):
+    if item.operation is None:
+        return lambda configmap_yaml: configmap_yaml
+    if item.operation == "patch":
+        if not item.operations:
+            raise HTTPException(status_code=422, detail="Operation 'patch' requires 'operations'")
+        return __with_pruning(__patch_mutation(item.operations), item.prune_unused)
+    if item.configuration is None:
+        raise HTTPException(status_code=422, detail=f"Operation '{item.operation}' requires 'configuration'")
+    sections = {section: item.configuration.get(section, {}) for section in ("receivers", "processors", "exporters", "service")}
+    if item.operation == "update":
+        mutate = __merge_mutation(sections)
+    elif item.operation == "replace":
+        mutate = __replace_mutation(sections)
+    else:
+        mutate = __remove_mutation(sections)
+    return __with_pruning(mutate, item.prune_unused)
+
+
+# Apply a mutation to a copy of the cached ConfigMap and report its diff, without writing
+def preview_mutation(namespace: str, configmap_name: str, mutate) -> dict:
+    _, configmap_yaml, base = cache.get_for_update(namespace, configmap_name)
+    configmap_yaml = mutate(configmap_yaml)
+    diff = diff_configmap(base.document, configmap_yaml)
+    index = base.index.updated(configmap_yaml, diff)
+    return {"configmap": configmap_yaml, "retries": 0, "written": False, "diff": diff, "dangling": index.dangling(),
+            "introduced": new_dangling_references(base.index, index), "unused": index.unused()}
+
+
+# Queue a mutation for the ConfigMap; in DEBUG mode it is applied to the test template instead
+def submit_mutation(namespace: str, configmap_name: str, mutate) -> Future:
+    if configmap_name is None:
+        return executors["read"].submit(contextvars.copy_context().run, __apply_debug_mutation, mutate)
+    return write_queue.submit(namespace, configmap_name, mutate)
+
+
+def __apply_debug_mutation(mutate, validate=True):
+    configmap_yaml = __load_debug_configmap()
+    before = copy.deepcopy(configmap_yaml)
+    configmap_yaml = mutate(configmap_yaml)
+    diff = diff_configmap(before, configmap_yaml)
+    index = ComponentIndex.build(configmap_yaml)
+    problems = new_dangling_references(ComponentIndex.build(before), index)
+    if validate and problems:
+        raise ValidationFailed(problems)
+    return {"configmap": configmap_yaml, "retries": 0, "written": False, "diff": diff, "dangling": index.dangling(),
+            "introduced": problems, "unused": index.unused()}
+
+
+# Update the ConfigMap with the new pipeline configuration
+def update_configmap(namespace: str, configmap_name: str, new_pipeline: dict):
+    return submit_mutation(namespace, configmap_name, __merge_mutation(new_pipeline)).result()
+        
+        
+def add_configmap(namespace: str, configmap_name: str, new_configmap: dict):
+    return submit_mutation(namespace, configmap_name, __replace_mutation(new_configmap)).result()
+
+        
+def remove_configmap(namespace: str, configmap_name: str, remove_pipeline: dict):
+    return submit_mutation(namespace, configmap_name, __remove_mutation(remove_pipeline)).result()
 
 
 
 # List all pods in a namespace
 def list_pods(namespace):
-    load_kubernetes_config()
-    v1 = client.CoreV1Api()
+    v1 = kube.core_v1()
 
     pods = v1.list_namespaced_pod(namespace)
-    print(f"Found {len(pods.items)} pods in namespace '{namespace}'.")
+    log.debug("Found %d pods in namespace '%s'.", len(pods.items), namespace)
     return [pod.metadata.name for pod in pods.items]
 
 
 # Find a pod by its label
 def find_pod_by_label(namespace, label_selector):
-    load_kubernetes_config()
-    v1 = client.CoreV1Api()
+    v1 = kube.core_v1()
 
     pods = v1.list_namespaced_pod(namespace, label_selector=label_selector)
     if pods.items:
-        print(f"Pod found with label '{label_selector}': {pods.items[0].metadata.name}")
+        log.info("Pod found with label '%s': %s", label_selector, pods.items[0].metadata.name, extra=SAMPLED)
         return pods.items[0].metadata.name
     else:
-        print(f"No pods found with label '{label_selector}' in namespace '{namespace}'.")
+        log.warning("No pods found with label '%s' in namespace '%s'.", label_selector, namespace)
         return None
     
 
+# Check whether a pod is running and Ready
+def __pod_is_ready(pod) -> bool:
+    if pod.metadata.deletion_timestamp is not None or pod.status is None or pod.status.phase != "Running":
+        return False
+    return any(condition.type == "Ready" and condition.status == "True" for condition in pod.status.conditions or [])
+
+
+# Find every Ready pod matching a label
+def find_pods_by_label(namespace, label_selector):
+    v1 = kube.core_v1()
+
+    pods = v1.list_namespaced_pod(namespace, label_selector=label_selector)
+    ready = [pod.metadata.name for pod in pods.items if __pod_is_ready(pod)]
+    log.info("Found %d/%d Ready pods with label '%s' in namespace '%s'.", len(ready), len(pods.items), label_selector, namespace, extra=SAMPLED)
+    return ready
+
+
 # Send a signal to a specific container in a pod using kubectl debug
-def send_signal_to_pod(namespace, pod_name, signal="HUP"):
-    load_kubernetes_config()
+async def send_signal_to_pod(namespace, pod_name, signal="HUP", container=COLLECTOR_CONTAINER):
     command = [
         "kubectl", "debug", "-it", pod_name, "-n", namespace, 
-        "--image=busybox", "--target=opentelemetrycollector", 
+        "--image=busybox", f"--target={container}", 
         "--", "/bin/sh", "-c", f"kill -{signal} 1"
     ]
 
+    async with __reload_slots():
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), RELOAD_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            log.error("Timeout sending signal to pod '%s'", pod_name)
+            raise HTTPException(status_code=504, detail=f"kubectl debug timed out after {RELOAD_TIMEOUT}s")
+        except BaseException:
+            # Cancelled, e.g. by the per-pod timeout: kubectl must not outlive its reload slot
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+
+    if process.returncode != 0:
+        error = f"Command {command} returned non-zero exit status {process.returncode}: {stderr.decode(errors='replace').strip()}"
+        log.error("Error sending signal to pod: %s", error)
+        raise HTTPException(status_code=500, detail=error)
+
+    log.info("Signal %s sent to container in pod '%s'.", signal, pod_name, extra=SAMPLED)
+    return {"message": f"Signal {signal} sent to pod '{pod_name}'."}
+
+
+# Send a signal through the Kubernetes exec API, without kubectl or an ephemeral container
+async def exec_signal_in_pod(namespace, pod_name, signal="HUP", container=COLLECTOR_CONTAINER):
+    def run():
+        v1 = kube.isolated(client.CoreV1Api)
+        response = kubernetes_stream.stream(
+            v1.connect_get_namespaced_pod_exec, pod_name, namespace,
+            container=container, command=["/bin/sh", "-c", f"kill -{signal} 1"],
+            stdin=False, stdout=True, stderr=True, tty=False, _preload_content=False,
+        )
+        try:
+            response.run_forever(timeout=RELOAD_TIMEOUT)
+            return response.returncode, response.read_stderr()
+        finally:
+            response.close()
+
+    returncode, stderr = await run_blocking("reload", run)
+    if returncode != 0:
+        raise HTTPException(status_code=500, detail=f"exec in pod '{pod_name}' returned exit status {returncode}: {stderr.strip()}")
+
+    log.info("Signal %s sent to container '%s' in pod '%s' via exec.", signal, container, pod_name, extra=SAMPLED)
+    return {"message": f"Signal {signal} sent to pod '{pod_name}'."}
+
+
+# Restart the workload owning the pod by patching its pod template, like `kubectl rollout restart`.
+# `restarted` is shared by a fan-out so that pods of the same workload only restart it once.
+def restart_pod_owner(namespace, pod_name, restarted=None):
+    v1 = kube.core_v1()
+    apps = kube.api(client.AppsV1Api)
+
+    pod = v1.read_namespaced_pod(pod_name, namespace)
+    owner = next((ref for ref in pod.metadata.owner_references or [] if ref.controller), None)
+    if owner is not None and owner.kind == "ReplicaSet":
+        replica_set = apps.read_namespaced_replica_set(owner.name, namespace)
+        owner = next((ref for ref in replica_set.metadata.owner_references or [] if ref.controller), None)
+    if owner is None or owner.kind not in ("Deployment", "DaemonSet", "StatefulSet"):
+        raise HTTPException(status_code=409, detail=f"Pod '{pod_name}' is not managed by a Deployment, DaemonSet or StatefulSet")
+
+    if restarted is not None and restarted.setdefault((namespace, owner.kind, owner.name), pod_name) != pod_name:
+        return {"message": f"Rolling restart of {owner.kind} '{owner.name}' already requested.", "owner": f"{owner.kind}/{owner.name}"}
+
+    patch = getattr(apps, {
+        "Deployment":  "patch_namespaced_deployment",
+        "DaemonSet":   "patch_namespaced_daemon_set",
+        "StatefulSet": "patch_namespaced_stateful_set",
+    }[owner.kind])
+    restarted_at = datetime.now(timezone.utc).isoformat()
+    patch(owner.name, namespace, {"spec": {"template": {"metadata": {"annotations": {"kubectl.kubernetes.io/restartedAt": restarted_at}}}}})
+
+    log.info("Rolling restart of %s '%s' requested for pod '%s'.", owner.kind, owner.name, pod_name)
+    return {"message": f"Rolling restart of {owner.kind} '{owner.name}' requested.", "owner": f"{owner.kind}/{owner.name}"}
+
+
+# Ask the collector itself to reload through an HTTP endpoint exposed by the pod
+async def http_reload_pod(namespace, pod_name, reload_url=None):
+    reload_url = reload_url or COLLECTOR_RELOAD_URL
+    if not reload_url:
+        raise HTTPException(status_code=422, detail="No reload_port given and AGENT_COLLECTOR_RELOAD_URL is not set")
+
+    pod = await run_blocking("read", lambda: kube.core_v1().read_namespaced_pod(pod_name, namespace))
+    pod_ip = pod.status.pod_ip
+    # Plain replacement: other braces in the URL are kept as they are
+    url = reload_url.replace("{pod_ip}", f"[{pod_ip}]" if ":" in pod_ip else pod_ip)
+    url = url.replace("{pod_name}", pod_name).replace("{namespace}", namespace)
+    async with httpx.AsyncClient(timeout=RELOAD_TIMEOUT) as http:
+        response = await http.post(url)
+        response.raise_for_status()
+
+    log.info("Collector in pod '%s' reloaded through %s.", pod_name, url, extra=SAMPLED)
+    return {"message": f"Collector in pod '{pod_name}' reloaded through {url}."}
+
+
+# Reload a collector pod with the requested strategy, falling back to kubectl debug
+async def reload_pod(namespace, pod_name, strategy="kubectl", signal="HUP", container=COLLECTOR_CONTAINER, reload_url=None, fallback=True, restarted=None):
+    started = time.perf_counter()
     try:
-        subprocess.run(command, check=True)
-        print(f"Signal {signal} sent to container in pod '{pod_name}'.")
-        return {"message": f"Signal {signal} sent to pod '{pod_name}'."}
-    except subprocess.CalledProcessError as e:
-        print(f"Error sending signal to pod: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        with stage(f"reload_{strategy}"):
+            if strategy == "exec":
+                result = await exec_signal_in_pod(namespace, pod_name, signal, container)
+            elif strategy == "rollout":
+                result = await run_blocking("reload", restart_pod_owner, namespace, pod_name, restarted)
+            elif strategy == "http":
+                result = await http_reload_pod(namespace, pod_name, reload_url)
+            else:
+                result = await send_signal_to_pod(namespace, pod_name, signal, container)
+        result = dict(result, strategy=strategy)
+    except Exception as e:
+        if strategy == "kubectl" or not fallback:
+            raise
+        log.warning("Reload strategy '%s' failed for pod '%s': %s. Falling back to kubectl debug", strategy, pod_name, e)
+        with stage("reload_kubectl"):
+            result = await send_signal_to_pod(namespace, pod_name, signal, container)
+        result = dict(result, strategy="kubectl", fallback_from=strategy, fallback_reason=str(e))
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+# Reload every pod in parallel with bounded concurrency and a per-pod timeout
+async def reload_pods(pods, strategy="kubectl", signal="HUP", container=COLLECTOR_CONTAINER, reload_url=None, fallback=True,
+                      max_parallel=RELOAD_FANOUT, pod_timeout=RELOAD_TIMEOUT):
+    slots = asyncio.Semaphore(max_parallel)
+    restarted = {}
+
+    async def reload_one(namespace, pod_name):
+        started = time.perf_counter()
+        async with slots:
+            try:
+                result = await asyncio.wait_for(
+                    reload_pod(namespace, pod_name, strategy, signal, container, reload_url, fallback, restarted), pod_timeout)
+                return dict(result, namespace=namespace, pod=pod_name, status="succeeded")
+            except asyncio.TimeoutError:
+                error = f"timed out after {pod_timeout}s"
+            except HTTPException as e:
+                error = e.detail
+            except Exception as e:
+                error = str(e)
+        log.error("Error reloading pod '%s/%s': %s", namespace, pod_name, error)
+        return {"namespace": namespace, "pod": pod_name, "status": "failed", "error": error,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    return await asyncio.gather(*(reload_one(namespace, pod_name) for namespace, pod_name in pods))
+
+
+# Debounced automatic reloads per ConfigMap, skipped when collector.yaml is unchanged since the last reload
+class ReloadScheduler:
+    def __init__(self, delay=AUTO_RELOAD_DEBOUNCE):
+        self.delay      = delay
+        self.reloaded   = 0
+        self.skipped    = 0
+        self._tasks     = {}
+        self._hashes    = {}
+
+    def schedule(self, namespace, configmap_name, result, label_selector=DEFAULT_LABEL_SELECTOR, strategy="kubectl"):
+        key = (namespace, configmap_name)
+        # The content before the first write is what the collector is running
+        self._hashes.setdefault(key, result["previous_hash"])
+        pending = self._tasks.pop(key, None)
+        if pending is not None:
+            pending.cancel()
+        elif result["hash"] == self._hashes[key]:
+            self.skipped += 1
+            return "unchanged"
+        self._tasks[key] = asyncio.get_running_loop().create_task(self._reload_later(key, label_selector, strategy))
+        return "scheduled"
+
+    async def _reload_later(self, key, label_selector, strategy):
+        await asyncio.sleep(self.delay)
+        if self._tasks.get(key) is asyncio.current_task():
+            del self._tasks[key]
+        namespace, configmap_name = key
+        try:
+            entry = await run_blocking("read", cache.get, namespace, configmap_name)
+            current = config_hash(entry.document)
+            if current == self._hashes.get(key):
+                self.skipped += 1
+                log.info("Configuration of %s/%s unchanged since last reload, skipping", namespace, configmap_name)
+                return
+
+            pods = await run_blocking("read", find_pods_by_label, namespace, label_selector)
+            results = await reload_pods([(namespace, pod_name) for pod_name in pods], strategy)
+            if any(result["status"] == "succeeded" for result in results):
+                self._hashes[key] = current
+                self.reloaded += 1
+            log.info("Automatic reload of %s/%s: %d/%d pods", namespace, configmap_name, sum(result['status'] == 'succeeded' for result in results), len(results))
+        except Exception as e:
+            log.error("Automatic reload of %s/%s failed: %s", namespace, configmap_name, e)
+
+    def close(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+
+reload_scheduler = ReloadScheduler()
+
+
+# Schedule a debounced reload after a successful write, when the request asked for it
+def __schedule_auto_reload(request, result: dict):
+    if not request.auto_reload or request.configmap_name is None:
+        return None
+    return reload_scheduler.schedule(request.namespace, request.configmap_name, result,
+                                     request.reload_label_selector or DEFAULT_LABEL_SELECTOR, request.reload_strategy)
     
     
 # Endpoints
 
 # Endpoint to create a new pipeline
 @app.put("/configurations")
-def update_pipeline(request: OTELConfiguration):
+async def update_pipeline(request: OTELConfiguration):
     try:
         data = request.model_dump()
         namespace = data['namespace']
         configmap_name = data['configmap_name']
 
         # Update the ConfigMap with the new pipeline
-        new_configmap = update_configmap(namespace, configmap_name, request.model_dump())
+        async with admission.admit("write", (namespace, configmap_name)):
+            result = await asyncio.wrap_future(submit_mutation(namespace, configmap_name, __with_pruning(__merge_mutation(data), request.prune_unused)))
 
-        return {"message": "Pipeline created and ConfigMap successfully updated"}
+        return {"message": "Pipeline created and ConfigMap successfully updated", "retries": result["retries"], "batch_size": result.get("batch_size", 1),
+                "written": result["written"], "diff": result["diff"], "reload": __schedule_auto_reload(request, result)}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error updating ConfigMap: {e}")
+        log.exception("Error updating ConfigMap: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     
 
 @app.post("/configurations")
-def add_pipeline(request: OTELConfiguration):
+async def add_pipeline(request: OTELConfiguration):
     try:
         data = request.model_dump()
         namespace = data['namespace']
         configmap_name = data['configmap_name']
 
         # Update the ConfigMap with the new pipeline
-        new_configmap = add_configmap(namespace, configmap_name, request.model_dump())
+        async with admission.admit("write", (namespace, configmap_name)):
+            result = await asyncio.wrap_future(submit_mutation(namespace, configmap_name, __with_pruning(__replace_mutation(request.sections()), request.prune_unused)))
 
-        return {"message": "Pipeline created and ConfigMap successfully updated"}
+        return {"message": "Pipeline created and ConfigMap successfully updated", "retries": result["retries"], "batch_size": result.get("batch_size", 1),
+                "written": result["written"], "diff": result["diff"], "reload": __schedule_auto_reload(request, result)}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error updating ConfigMap: {e}")
+        log.exception("Error updating ConfigMap: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     
     
 @app.delete("/configurations")
-def remove_pipeline(request: OTELConfiguration):
+async def remove_pipeline(request: OTELConfiguration):
     try:
         data = request.model_dump()
         namespace = data['namespace']
         configmap_name = data['configmap_name']
 
         # Update the ConfigMap with the new pipeline
-        configmap = remove_configmap(namespace, configmap_name, request.model_dump())
+        async with admission.admit("write", (namespace, configmap_name)):
+            result = await asyncio.wrap_future(submit_mutation(namespace, configmap_name, __with_pruning(__remove_mutation(data), request.prune_unused)))
 
         # return {"message": "Pipeline deleted and ConfigMap successfully updated. \n", "configmap": configmap}
-        return {"message": "Pipeline deleted and ConfigMap successfully updated."}
+        return {"message": "Pipeline deleted and ConfigMap successfully updated.", "retries": result["retries"], "batch_size": result.get("batch_size", 1),
+                "written": result["written"], "diff": result["diff"], "reload": __schedule_auto_reload(request, result)}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error updating ConfigMap: {e}")
+        log.exception("Error updating ConfigMap: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
     
 
-@app.get("/configurations")
-def list_pipelines():
+# Endpoint to apply small path-addressed edits without sending the whole configuration
+@app.patch("/configurations")
+async def patch_pipeline(request: OTELPatch):
     try:
-        namespace = "monitoring"
-        configmap_name = "collector-config"
-        
-        # Load Kubernetes config
-        load_kubernetes_config()
-        v1 = client.CoreV1Api()
-        
-        # Retrieve the current ConfigMap
-        configmap = v1.read_namespaced_config_map(configmap_name, namespace)
-        configmap_yaml = yaml.safe_load(configmap.data['collector.yaml'])
-        
-        # Extract the pipelines
-        return configmap_yaml
+        for operation in request.operations:
+            if operation.op in ("move", "copy") and operation.from_path is None:
+                raise HTTPException(status_code=422, detail=f"Operation '{operation.op}' requires 'from'")
+
+        # Update the ConfigMap with the patch
+        async with admission.admit("write", (request.namespace, request.configmap_name)):
+            result = await asyncio.wrap_future(submit_mutation(request.namespace, request.configmap_name, __with_pruning(__patch_mutation(request.operations), request.prune_unused)))
+
+        return {"message": "Configuration patched and ConfigMap successfully updated", "retries": result["retries"], "batch_size": result.get("batch_size", 1),
+                "written": result["written"], "diff": result["diff"], "reload": __schedule_auto_reload(request, result)}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error listing pipelines: {e}")
+        log.exception("Error patching ConfigMap: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
-    
 
-# Endpoint to reload the OpenTelemetry Collector configuration
-@app.post("/reload")
-def reload_config(request: OTELReload):
+
+# Endpoint to apply many operations across ConfigMaps, streaming one NDJSON line per item as it completes
+@app.post("/configurations/bulk")
+async def bulk_pipelines(request: OTELBulk):
+    slots = asyncio.Semaphore(request.parallelism)
+    stop = asyncio.Event()
+
+    async def run(index: int, item: BulkItem):
+        outcome = {"index": index, "namespace": item.namespace, "configmap_name": item.configmap_name, "operation": item.operation}
+        async with slots:
+            if stop.is_set():
+                return dict(outcome, status="skipped")
+            try:
+                mutate = __bulk_mutation(item)
+                if request.dry_run and item.configmap_name is not None:
+                    result = await run_blocking("read", preview_mutation, item.namespace, item.configmap_name, mutate)
+                else:
+                    async with admission.admit("write", (item.namespace, item.configmap_name)):
+                        result = await asyncio.wrap_future(submit_mutation(item.namespace, item.configmap_name, mutate))
+                return dict(outcome, status="succeeded", written=result["written"], diff=result["diff"], retries=result["retries"])
+            except Exception as e:
+                if request.stop_on_failure:
+                    stop.set()
+                error = e.detail if isinstance(e, HTTPException) else str(e)
+                log.error("Error in bulk item %d (%s/%s): %s", index, item.namespace, item.configmap_name, error)
+                return dict(outcome, status="failed", error=error)
+
+    async def results():
+        tasks = [asyncio.ensure_future(run(index, item)) for index, item in enumerate(request.items)]
+        summary = {"succeeded": 0, "failed": 0, "skipped": 0}
+        try:
+            for completed in asyncio.as_completed(tasks):
+                outcome = await completed
+                summary[outcome["status"]] += 1
+                yield json.dumps(outcome, default=str) + "\n"
+            yield json.dumps({"summary": summary, "dry_run": request.dry_run}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+# Endpoint to list the recorded versions of a ConfigMap, newest first
+@app.get("/configurations/history")
+async def configuration_history(namespace: str, configmap_name: str):
+    return {"namespace": namespace, "configmap_name": configmap_name, "versions": history.versions(namespace, configmap_name)}
+
+
+# Endpoint to diff two recorded versions (the current one by default)
+@app.get("/configurations/history/diff")
+async def configuration_history_diff(namespace: str, configmap_name: str, from_version: str, to_version: Optional[str] = None):
+    before = history.document(namespace, configmap_name, from_version)
+    if to_version is None:
+        to_version = history.versions(namespace, configmap_name)[0]["version"]
+    after = history.document(namespace, configmap_name, to_version)
+    return {"from_version": history.resolve(namespace, configmap_name, from_version),
+            "to_version": history.resolve(namespace, configmap_name, to_version),
+            "diff": diff_configmap(before, after)}
+
+
+# Endpoint to restore a recorded version; nothing is written if it matches the current content
+@app.post("/configurations/rollback")
+async def rollback_pipeline(request: OTELRollback):
+    document = history.document(request.namespace, request.configmap_name, request.version)
     try:
-        namespace = request.model_dump()['namespace']
-        label_selector =  request.model_dump()['label_selector'] if  request.model_dump()['namespace'] is not None else "app.kubernetes.io/name=opentelemetrycollector"
+        async with admission.admit("write", (request.namespace, request.configmap_name)):
+            result = await asyncio.wrap_future(submit_mutation(request.namespace, request.configmap_name, lambda configmap_yaml: copy.deepcopy(document)))
 
-        # Find the OpenTelemetry pod by its label
-        pod_name = find_pod_by_label(namespace, label_selector)
-        if not pod_name:
-            raise HTTPException(status_code=404, detail="OpenTelemetry pod not found")
+        return {"message": "Configuration rolled back" if result["written"] else "Configuration already at this version",
+                "version": history.resolve(request.namespace, request.configmap_name, request.version), "retries": result["retries"],
+                "written": result["written"], "diff": result["diff"], "reload": __schedule_auto_reload(request, result)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.exception("Error rolling back ConfigMap: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Send the SIGHUP signal to the container using kubectl debug
-        return send_signal_to_pod(namespace, pod_name)
 
+# Endpoint to check a change (or the current configuration) without writing it
+@app.post("/validate")
+async def validate_pipeline(request: OTELValidate):
+    try:
+        mutate = __bulk_mutation(request)
+        if request.configmap_name is None:
+            result = await run_blocking("read", __apply_debug_mutation, mutate, False)
+        else:
+            result = await run_blocking("read", preview_mutation, request.namespace, request.configmap_name, mutate)
+        # `valid` describes the resulting configuration; `introduced` are the problems a write would be rejected for
+        return {"valid": not result["dangling"], "dangling": result["dangling"], "introduced": result["introduced"],
+                "unused": result["unused"], "diff": result["diff"]}
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error reloading configuration: {e}")
+        log.exception("Error validating configuration: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# Read the `config` of an OpenTelemetryCollector resource (a YAML string or an object, depending on the API version)
+def read_collector_resource(target: CollectorTarget) -> dict:
+    group, version = target.api_version.split("/", 1)
+    with stage("k8s_read"):
+        resource = kube.custom_objects().get_namespaced_custom_object(group, version, target.namespace, "opentelemetrycollectors", target.resource_name)
+    configuration = resource.get("spec", {}).get("config") or {}
+    return load_yaml(configuration) if isinstance(configuration, str) else configuration
+
+
+# Configuration of a target and its content hash
+async def read_target(target: CollectorTarget):
+    if target.kind == "opentelemetrycollector":
+        document = await run_blocking("read", read_collector_resource, target)
+        return document, config_hash(document)
+
+    # Served from the watch-backed cache, a miss is read on the read pool
+    entry = cache.get(target.namespace, target.configmap_name, read_through=False)
+    if entry is None:
+        entry = await run_blocking("read", cache.get, target.namespace, target.configmap_name)
+    return entry.document, entry.hash
+
+
+# Keep only the given key paths of a configuration
+def select_fields(document: dict, paths: list) -> dict:
+    selected = {}
+    for keys in paths:
+        value = document
+        try:
+            for key in keys:
+                value = value[key]
+        except (KeyError, TypeError):
+            continue
+        parent = selected
+        for key in keys[:-1]:
+            parent = parent.setdefault(key, {})
+        parent[keys[-1]] = value
+    return selected
+
+
+# Weak ETag of a response, from the content hashes it was built from and the field selection
+def response_etag(versions: list, fields: Optional[str]) -> str:
+    digest = hashlib.sha256(json.dumps([versions, fields or ""]).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def __etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag.removeprefix("W/") for candidate in candidates)
+
+
+# Content codings accepted by the client, without those refused with q=0
+def __accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for coding in accept_encoding.split(","):
+        name, _, parameters = coding.strip().partition(";")
+        if parameters.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+_rendered      = collections.OrderedDict()
+_rendered_lock = threading.Lock()
+
+
+# JSON body of a configuration response, encoded once per ETag and content coding
+def render_body(etag: str, encoding: Optional[str], payload) -> bytes:
+    key = (etag, encoding)
+    with _rendered_lock:
+        body = _rendered.get(key)
+        if body is not None:
+            _rendered.move_to_end(key)
+            return body
+    if encoding is None:
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    elif encoding == "zstd":
+        body = zstandard.ZstdCompressor().compress(render_body(etag, None, payload))
+    else:
+        body = gzip.compress(render_body(etag, None, payload), compresslevel=6)
+    with _rendered_lock:
+        _rendered[key] = body
+        while len(_rendered) > RENDER_CACHE_SIZE:
+            _rendered.popitem(last=False)
+    return body
+
+
+# Response with the ETag, compressed with zstd or gzip when it is large enough and the client accepts it
+def encoded_response(accept_encoding: str, etag: str, payload) -> Response:
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    body = render_body(etag, None, payload)
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        accepted = __accepted_encodings(accept_encoding)
+        encoding = "zstd" if zstandard is not None and "zstd" in accepted else "gzip" if "gzip" in accepted else None
+        if encoding is not None:
+            body = render_body(etag, encoding, payload)
+            headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# Endpoint to get the configuration of a target (the default one if none is given), or of every target matching a selector.
+# `fields` keeps only some paths (e.g. `service.pipelines,receivers`); If-None-Match with the ETag gives 304 when nothing changed.
+@app.get("/configurations")
+async def list_pipelines(request: Request, target: Optional[str] = None, selector: Optional[str] = None, fields: Optional[str] = None):
+    try:
+        paths = [__patch_path(field.strip()) for field in fields.split(",") if field.strip()] if fields else []
+
+        if selector is None:
+            # Extract the pipelines
+            document, version = await read_target(targets.get(target) if target else targets.default())
+            payload = select_fields(document, paths) if paths else document
+            versions = [version]
+        else:
+            selected = targets.select(selector)
+            results = await asyncio.gather(*(read_target(target) for target in selected), return_exceptions=True)
+            items, versions = [], []
+            for target, result in zip(selected, results):
+                if isinstance(result, Exception):
+                    error = result.detail if isinstance(result, HTTPException) else str(result)
+                    items.append(dict(target.describe(), error=error))
+                    versions.append([target.describe(), "error", str(error)])
+                else:
+                    document, version = result
+                    items.append(dict(target.describe(), configuration=select_fields(document, paths) if paths else document))
+                    versions.append([target.describe(), version])
+            payload = {"targets": items}
+
+        etag = response_etag(versions, fields)
+        if __etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"})
+        return await run_blocking("read", encoded_response, request.headers.get("accept-encoding", ""), etag, payload)
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.exception("Error listing pipelines: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Endpoint to list the configured targets
+@app.get("/targets")
+async def list_targets():
+    return {"targets": [target.describe() for target in targets.targets()]}
+    
+
+# Leader election state of this replica
+@app.get("/leader")
+async def leader_status():
+    return leader.status()
+
+
+# Readiness probe: 200 once the API server has answered for every target, with per-target errors
+@app.get("/ready")
+async def ready():
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
+
+
+# Cache hit/miss counters and per-ConfigMap staleness
+@app.get("/configurations/cache")
+async def cache_stats():
+    return cache.stats()
+
+
+# Prometheus metrics of the agent itself
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+# Endpoint to reload the OpenTelemetry Collector configuration on every matching pod
+@app.post("/reload")
+async def reload_config(request: OTELReload):
+    # Limited per namespace before the try below, so a 429 is not reported as a 500
+    async with admission.admit_all("reload", [(namespace,) for namespace in request.namespaces or [request.namespace]]):
+        try:
+            namespace = request.model_dump()['namespace']
+            label_selector =  request.model_dump()['label_selector'] if  request.model_dump()['namespace'] is not None else "app.kubernetes.io/name=opentelemetrycollector"
+            namespaces = request.namespaces or [namespace]
+
+            # Find the Ready OpenTelemetry pods by their label
+            found = await asyncio.gather(*(run_blocking("read", find_pods_by_label, ns, label_selector) for ns in namespaces))
+            pods = [(ns, pod_name) for ns, pod_names in zip(namespaces, found) for pod_name in pod_names]
+            if not pods:
+                raise HTTPException(status_code=404, detail="OpenTelemetry pod not found")
+
+            # Reload the collectors in parallel with the requested strategy
+            results = await reload_pods(pods, request.strategy, request.signal, request.container, request.reload_url_template(),
+                                        request.fallback, request.max_parallel, request.pod_timeout)
+            succeeded = [result for result in results if result["status"] == "succeeded"]
+            failed = [result for result in results if result["status"] == "failed"]
+            if not succeeded:
+                raise HTTPException(status_code=500, detail="; ".join(f"{result['pod']}: {result['error']}" for result in failed))
+
+            if request.strategy in ("kubectl", "exec"):
+                message = f"Signal {request.signal} sent to {len(succeeded)}/{len(results)} pods."
+            else:
+                message = f"Reload ({request.strategy}) succeeded on {len(succeeded)}/{len(results)} pods."
+            return {"message": message, "succeeded": len(succeeded), "failed": len(failed), "pods": results}
+
+        except Exception as e:
+            log.exception("Error reloading configuration: %s", e)
+            raise HTTPException(status_code=500, detail=str(e))
     
 
 # Run the FastAPI app with Uvicorn
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("agent:app", host="0.0.0.0", port=8000, reload=True, workers=1)
\ No newline at end of file
+    # Requests are logged (sampled) by the request_context middleware
+    uvicorn.run("agent:app", host="0.0.0.0", port=8000, reload=True, workers=1, access_log=False)
\ No newline at end of file
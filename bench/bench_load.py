@@ -0,0 +1,107 @@
+# End-to-end load test of the API endpoints against the in-process fake Kubernetes API server
+#
+#   python bench/bench_load.py [--requests 500] [--concurrency 16] [--size 100] [--latency-ms 2] [--conflict-rate 0]
+#
+# Requests go through the ASGI app in-process; the agent talks to the fake API server over HTTP
+# with the real Kubernetes client, ConfigMap cache and watch. /reload is not covered: it needs pods.
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import httpx
+from configs import synthetic_config
+from fake_apiserver import FakeApiServer
+
+NAMESPACE = "monitoring"
+CONFIGMAP = "collector-config"
+TARGET = {"namespace": NAMESPACE, "configmap_name": CONFIGMAP}
+
+
+def sections(receivers=None):
+    return {"receivers": receivers or {}, "processors": {}, "exporters": {}, "service": {}}
+
+
+def receiver(i):
+    return {f"bench/{i}": {"endpoint": f"0.0.0.0:{10000 + i}"}}
+
+
+def interval_patch(i):
+    return [{"op": "replace", "path": "/receivers/prometheus~10/config/scrape_configs/0/scrape_interval", "value": f"{i % 60 + 1}s"}]
+
+
+# (name, method, path, body for the i-th request); run in this order, DELETE removes what PUT added
+SCENARIOS = [
+    ("GET /configurations", "GET", "/configurations", None),
+    ("PUT /configurations", "PUT", "/configurations", lambda i: dict(TARGET, **sections(receiver(i)))),
+    ("PATCH /configurations", "PATCH", "/configurations", lambda i: dict(TARGET, operations=interval_patch(i))),
+    ("POST /validate", "POST", "/validate", lambda i: dict(TARGET, operation="patch", operations=interval_patch(i))),
+    ("DELETE /configurations", "DELETE", "/configurations", lambda i: dict(TARGET, **sections(receiver(i)))),
+]
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+async def run_scenario(http, method, path, body, requests, concurrency):
+    latencies = []
+    errors = 0
+    next_request = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in next_request:
+            started = time.perf_counter()
+            response = await http.request(method, path, json=body(i) if body else None)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return requests / elapsed, percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000, errors
+
+
+async def main(args):
+    server = FakeApiServer(latency=args.latency_ms / 1000, conflict_rate=args.conflict_rate).start()
+    server.put(NAMESPACE, CONFIGMAP, synthetic_config(args.size))
+
+    # The client reads KUBECONFIG when it is imported, so the agent is imported once the server runs
+    os.environ["KUBECONFIG"] = server.kubeconfig()
+    os.environ["AGENT_RATE_LIMITS"] = args.rate_limits
+    import agent
+    agent.configure_logging(level="WARNING")
+    agent.kube.start()
+
+    try:
+        transport = httpx.ASGITransport(app=agent.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://agent") as http:
+            print(f"size={args.size} requests={args.requests} concurrency={args.concurrency} "
+                  f"latency={args.latency_ms}ms conflict_rate={args.conflict_rate}")
+            print(f"{'endpoint':<24} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>8}")
+            for name, method, path, body in SCENARIOS:
+                rps, p50, p99, errors = await run_scenario(http, method, path, body, args.requests, args.concurrency)
+                print(f"{name:<24} {rps:>10.1f} {p50:>10.2f} {p99:>10.2f} {errors:>8}")
+        print(f"API server: {server.counters}")
+    finally:
+        agent.write_queue.close()
+        agent.cache.close()
+        agent.kube.close()
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the agent endpoints against a fake Kubernetes API server")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--size", type=int, default=100, help="components per section of the configuration")
+    parser.add_argument("--latency-ms", type=float, default=2, help="added latency of each API server call")
+    parser.add_argument("--conflict-rate", type=float, default=0, help="fraction of replaces racing a concurrent writer")
+    parser.add_argument("--rate-limits", default="{write: {rate: 0, concurrency: 0}}",
+                        help="AGENT_RATE_LIMITS for the run; the default disables write limits, \"\" keeps the agent defaults")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,114 @@
+# Time of the merge/remove helpers by configuration size
+#
+# `remove` deletes half of the components of a configuration with one pipeline per 10 components,
+# `remove wide` the same from a configuration where one pipeline references every component.
+#
+#   python bench/bench_mutations.py [sizes...]
+#
+# Each run works on its own copy of the configuration, made before the clock starts.
+
+import copy
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+from configs import synthetic_config
+
+update_configmap = getattr(agent, "__update_configmap")
+remove_configmap = getattr(agent, "__remove_configmap")
+SECTIONS = ("receivers", "processors", "exporters", "service")
+
+
+# Best time per call (ms) of fn(document) over `repeat` rounds, each on fresh copies of `document`
+def measure(fn, document, repeat=3, budget=0.05):
+    copied = time.perf_counter()
+    copy.deepcopy(document)
+    copied = time.perf_counter() - copied
+    number = 1
+    while True:
+        copies = [copy.deepcopy(document) for _ in range(number)]
+        started = time.perf_counter()
+        for target in copies:
+            fn(target)
+        elapsed = time.perf_counter() - started
+        # Stop when the calls are long enough to time, or the copies get too expensive to make
+        if elapsed >= budget or copied * number * 2 >= 0.25:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        copies = [copy.deepcopy(document) for _ in range(number)]
+        started = time.perf_counter()
+        for target in copies:
+            fn(target)
+        best = min(best, time.perf_counter() - started)
+    return best / number * 1000
+
+
+# PUT payload: a tenth of the components changed and as many new ones
+def update_payload(document, size):
+    changed = max(1, size // 10)
+    new = synthetic_config(size + changed)
+    return {
+        "receivers": {f"prometheus/{i}": new["receivers"][f"prometheus/{i}"] for i in range(size - changed, size + changed)},
+        "processors": {f"attributes/{i}": {"actions": [{"action": "delete", "key": "domain"}]} for i in range(changed)},
+        "exporters": {f"prometheusremotewrite/{i}": new["exporters"][f"prometheusremotewrite/{i}"] for i in range(size, size + changed)},
+        "service": {"pipelines": {"metrics/0": {"exporters": ["prometheusremotewrite/0", f"prometheusremotewrite/{size}"]}}},
+    }
+
+
+# Same components as synthetic_config, all in a single pipeline
+def wide_config(size):
+    document = synthetic_config(size)
+    document["service"]["pipelines"] = {"metrics": {
+        "receivers": list(document["receivers"]),
+        "processors": list(document["processors"]),
+        "exporters": list(document["exporters"]),
+    }}
+    return document
+
+
+# DELETE payload: half of the components and their references in the pipelines
+def remove_payload(document, size):
+    removed = set(range(0, size, 2))
+    payload = {section: {} for section in SECTIONS}
+    for i in removed:
+        payload["receivers"][f"prometheus/{i}"] = document["receivers"][f"prometheus/{i}"]
+        payload["processors"][f"attributes/{i}"] = document["processors"][f"attributes/{i}"]
+        payload["exporters"][f"prometheusremotewrite/{i}"] = document["exporters"][f"prometheusremotewrite/{i}"]
+    payload["service"] = {"pipelines": {
+        name: {section: [component for component in components if int(component.rsplit("/", 1)[1]) in removed]
+               for section, components in pipeline.items()}
+        for name, pipeline in document["service"]["pipelines"].items()
+    }}
+    return payload
+
+
+def merge(payload):
+    def apply(document):
+        for section in SECTIONS:
+            update_configmap(payload[section], document[section])
+    return apply
+
+
+# What the DELETE mutation does
+def remove(payload):
+    def apply(document):
+        for section in SECTIONS:
+            remove_configmap(payload[section], document[section], (section,))
+    return apply
+
+
+def main(sizes):
+    print(f"{'size':>6} {'update':>10} {'remove':>10} {'remove wide':>12}   (ms per call)")
+    for size in sizes:
+        document = synthetic_config(size)
+        wide = wide_config(size)
+        update = merge(update_payload(document, size))
+        print(f"{size:>6} {measure(update, document):>10.3f} {measure(remove(remove_payload(document, size)), document):>10.3f} "
+              f"{measure(remove(remove_payload(wide, size)), wide):>12.3f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10, 100, 1000, 5000])
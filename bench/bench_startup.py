@@ -0,0 +1,91 @@
+# Cold start of the agent: import time, and time from process start to listening, ready and first request
+#
+#   python bench/bench_startup.py [--runs 5] [--size 100] [--latency-ms 2]
+#
+# `import` is `import agent` in a fresh interpreter. The server is started with uvicorn against the
+# in-process fake Kubernetes API server; `listening` is the first answer on /ready (503 or 200),
+# `ready` the first 200 on /ready, and `first GET` the first 200 on GET /configurations after it.
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import httpx
+from configs import synthetic_config
+from fake_apiserver import FakeApiServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+IMPORT = "import time; started = time.perf_counter(); import agent; print(time.perf_counter() - started)"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_time(env):
+    output = subprocess.run([sys.executable, "-c", IMPORT], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return float(output.stdout.split()[-1]) * 1000
+
+
+# Milliseconds from starting the process until `path` answers with one of `statuses`
+def wait_for(http, url, started, statuses, timeout=30):
+    while time.perf_counter() - started < timeout:
+        try:
+            if http.get(url).status_code in statuses:
+                return (time.perf_counter() - started) * 1000
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} not answering with {statuses} after {timeout}s")
+
+
+def server_start(env):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "agent:app", "--port", str(port), "--no-access-log", "--log-level", "warning"],
+                               cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(timeout=5) as http:
+            listening = wait_for(http, base + "/ready", started, (200, 503))
+            ready = wait_for(http, base + "/ready", started, (200,))
+            first_get = wait_for(http, base + "/configurations", started, (200,))
+        return listening, ready, first_get
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(name, values):
+    print(f"{name:<12} {statistics.median(values):>10.1f} {min(values):>10.1f} {max(values):>10.1f}")
+
+
+def main(args):
+    server = FakeApiServer(latency=args.latency_ms / 1000).start()
+    server.put("monitoring", "collector-config", synthetic_config(args.size))
+    env = dict(os.environ, KUBECONFIG=server.kubeconfig(), AGENT_LOG_LEVEL="WARNING")
+    try:
+        imports = [import_time(env) for _ in range(args.runs)]
+        starts = [server_start(env) for _ in range(args.runs)]
+    finally:
+        server.stop()
+
+    print(f"runs={args.runs} size={args.size} latency={args.latency_ms}ms")
+    print(f"{'ms':<12} {'median':>10} {'min':>10} {'max':>10}")
+    summary("import", imports)
+    for name, values in zip(("listening", "ready", "first GET"), zip(*starts)):
+        summary(name, values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import and startup time of the agent")
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes measured")
+    parser.add_argument("--size", type=int, default=100, help="components per section of the served configuration")
+    parser.add_argument("--latency-ms", type=float, default=2, help="added latency of each API server call")
+    main(parser.parse_args())
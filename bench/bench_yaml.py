@@ -0,0 +1,35 @@
+# Parse and dump time of collector.yaml by configuration size, pure Python vs libyaml
+#
+#   python bench/bench_yaml.py [sizes...]
+
+import os
+import sys
+import timeit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import yaml
+import agent
+from configs import synthetic_config
+
+
+def measure(fn, repeat=5):
+    number = 1
+    while timeit.timeit(fn, number=number) < 0.2:
+        number *= 2
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000
+
+
+def main(sizes):
+    print(f"libyaml available: {yaml.__with_libyaml__}")
+    print(f"{'size':>6} {'bytes':>10} {'load py':>10} {'load C':>10} {'dump py':>10} {'dump C':>10}   (ms)")
+    for size in sizes:
+        document = synthetic_config(size)
+        text = yaml.safe_dump(document)
+        load_py = measure(lambda: yaml.load(text, Loader=yaml.SafeLoader))
+        load_c = measure(lambda: agent.load_yaml(text))
+        dump_py = measure(lambda: yaml.dump(document, Dumper=yaml.SafeDumper))
+        dump_c = measure(lambda: agent.dump_yaml(document))
+        print(f"{size:>6} {len(text):>10} {load_py:>10.2f} {load_c:>10.2f} {dump_py:>10.2f} {dump_c:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or [10, 100, 500, 1000])
@@ -0,0 +1,49 @@
+# Synthetic collector configurations for the benchmarks
+
+
+# Collector configuration with `size` receivers, processors and exporters, and one pipeline per 10 of them
+def synthetic_config(size: int) -> dict:
+    receivers = {
+        f"prometheus/{i}": {
+            "config": {
+                "scrape_configs": [
+                    {
+                        "job_name": f"job-{i}",
+                        "scrape_interval": "10s",
+                        "static_configs": [{"targets": [f"10.0.{i // 250}.{i % 250}:9100"]}],
+                        "relabel_configs": [
+                            {"source_labels": ["__address__"], "target_label": "instance", "regex": "(.+)"},
+                        ],
+                    }
+                ]
+            }
+        }
+        for i in range(size)
+    }
+    processors = {
+        f"attributes/{i}": {
+            "actions": [
+                {"action": "insert", "key": "domain", "value": f"domain-{i}"},
+                {"action": "insert", "key": "node.name", "from_attribute": "k8s.node.name"},
+            ]
+        }
+        for i in range(size)
+    }
+    exporters = {
+        f"prometheusremotewrite/{i}": {"endpoint": f"http://prometheus-{i}.monitoring.svc:8080/api/v1/write"}
+        for i in range(size)
+    }
+    pipelines = {
+        f"metrics/{p}": {
+            "receivers": [f"prometheus/{i}" for i in range(p * 10, min(size, p * 10 + 10))],
+            "processors": [f"attributes/{i}" for i in range(p * 10, min(size, p * 10 + 10))],
+            "exporters": [f"prometheusremotewrite/{i}" for i in range(p * 10, min(size, p * 10 + 10))],
+        }
+        for p in range(max(1, size // 10))
+    }
+    return {
+        "receivers": receivers,
+        "processors": processors,
+        "exporters": exporters,
+        "service": {"pipelines": pipelines},
+    }
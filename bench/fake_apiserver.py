@@ -0,0 +1,206 @@
+# In-process fake Kubernetes API server for ConfigMaps: read, replace (409 on stale resourceVersion) and watch
+#
+# Only the calls made by the agent are implemented. `latency` delays every non-watch request and
+# `conflict_rate` makes that fraction of replaces race with a simulated concurrent writer.
+
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import yaml
+
+CONFIGMAP_PATH = re.compile(r"^/api/v1/namespaces/([^/]+)/configmaps(?:/([^/]+))?$")
+
+
+class FakeApiServer:
+    def __init__(self, latency=0.0, conflict_rate=0.0, host="127.0.0.1", port=0):
+        self.latency       = latency
+        self.conflict_rate = conflict_rate
+        self.configmaps    = {}
+        self.version       = 0
+        self.counters      = {"read": 0, "replace": 0, "conflict": 0, "watch": 0, "event": 0}
+        self._changed      = threading.Condition()
+        self._stopped      = False
+        self._server       = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread       = None
+        self._kubeconfig   = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # Create or overwrite a ConfigMap holding `document` as collector.yaml
+    def put(self, namespace, name, document):
+        with self._changed:
+            self.version += 1
+            self.configmaps[(namespace, name)] = {
+                "apiVersion": "v1",
+                "kind": "ConfigMap",
+                "metadata": {"name": name, "namespace": namespace, "resourceVersion": str(self.version)},
+                "data": {"collector.yaml": yaml.safe_dump(document)},
+            }
+            self._changed.notify_all()
+
+    # Kubeconfig file pointing at this server, for KUBECONFIG
+    def kubeconfig(self):
+        if self._kubeconfig is None:
+            descriptor, self._kubeconfig = tempfile.mkstemp(prefix="fake-apiserver-", suffix=".yaml")
+            with os.fdopen(descriptor, "w") as file:
+                yaml.safe_dump({
+                    "apiVersion": "v1",
+                    "kind": "Config",
+                    "clusters": [{"name": "fake", "cluster": {"server": self.url}}],
+                    "users": [{"name": "fake", "user": {"token": "fake"}}],
+                    "contexts": [{"name": "fake", "context": {"cluster": "fake", "user": "fake"}}],
+                    "current-context": "fake",
+                }, file)
+        return self._kubeconfig
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-apiserver", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+        if self._kubeconfig is not None:
+            os.unlink(self._kubeconfig)
+            self._kubeconfig = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, name):
+        with self._changed:
+            self.counters[name] += 1
+
+    def _read(self, namespace, name):
+        self._count("read")
+        with self._changed:
+            configmap = self.configmaps.get((namespace, name))
+        if configmap is None:
+            return 404, _status(404, "NotFound", f'configmaps "{name}" not found')
+        return 200, configmap
+
+    def _replace(self, namespace, name, body):
+        self._count("replace")
+        with self._changed:
+            current = self.configmaps.get((namespace, name))
+            if current is None:
+                return 404, _status(404, "NotFound", f'configmaps "{name}" not found')
+            if self.conflict_rate and random.random() < self.conflict_rate:
+                # Another writer got there first
+                self.version += 1
+                current["metadata"]["resourceVersion"] = str(self.version)
+                self._changed.notify_all()
+            if body["metadata"].get("resourceVersion") != current["metadata"]["resourceVersion"]:
+                self.counters["conflict"] += 1
+                return 409, _status(409, "Conflict", "the object has been modified; please apply your changes to the latest version and try again")
+            self.version += 1
+            body["metadata"]["resourceVersion"] = str(self.version)
+            self.configmaps[(namespace, name)] = body
+            self._changed.notify_all()
+            return 200, body
+
+    # Yield watch events for one ConfigMap until the timeout or server shutdown
+    def _events(self, namespace, name, resource_version, timeout):
+        self._count("watch")
+        deadline = time.monotonic() + timeout
+        sent = int(resource_version or 0)
+        while True:
+            with self._changed:
+                while True:
+                    configmap = self.configmaps.get((namespace, name))
+                    if self._stopped or time.monotonic() >= deadline:
+                        return
+                    if configmap is None:
+                        yield {"type": "DELETED", "object": {"metadata": {"name": name, "namespace": namespace}}}
+                        return
+                    if int(configmap["metadata"]["resourceVersion"]) > sent:
+                        break
+                    self._changed.wait(min(1.0, deadline - time.monotonic()))
+                sent = int(configmap["metadata"]["resourceVersion"])
+                self.counters["event"] += 1
+            yield {"type": "MODIFIED", "object": configmap}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, code, body):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _route(self):
+                url = urlparse(self.path)
+                match = CONFIGMAP_PATH.match(url.path)
+                if match is None:
+                    self._send(404, _status(404, "NotFound", f"{url.path} is not served by the fake API server"))
+                    return None
+                return match.group(1), match.group(2), {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+            def do_GET(self):
+                route = self._route()
+                if route is None:
+                    return
+                namespace, name, query = route
+                if name is not None:
+                    time.sleep(server.latency)
+                    self._send(*server._read(namespace, name))
+                    return
+                if query.get("watch") not in ("true", "1", "True"):
+                    self._send(405, _status(405, "MethodNotAllowed", "only watches are supported on collections"))
+                    return
+                name = query.get("fieldSelector", "").partition("metadata.name=")[2]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for event in server._events(namespace, name, query.get("resourceVersion"), float(query.get("timeoutSeconds", 300))):
+                        line = json.dumps(event).encode() + b"\n"
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+            def do_PUT(self):
+                route = self._route()
+                if route is None:
+                    return
+                namespace, name, _ = route
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                time.sleep(server.latency)
+                self._send(*server._replace(namespace, name, body))
+
+        return Handler
+
+
+def _status(code, reason, message):
+    return {"kind": "Status", "apiVersion": "v1", "status": "Failure", "code": code, "reason": reason, "message": message}
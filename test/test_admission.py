@@ -0,0 +1,123 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import asyncio
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from unittest.mock import patch
+from test_conflicts import ConflictingCoreV1, patched, payload
+
+client = TestClient(agent.app)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_writes_over_rate_get_429():
+    """
+    Writes to a ConfigMap beyond its token bucket get 429 with Retry-After; other ConfigMaps are not affected.
+    """
+    rejected = sample("agent_admission_rejected_total", kind="write", reason="rate")
+    kube_patch, cache_patch = patched(ConflictingCoreV1(conflicts=0))
+    with kube_patch, cache_patch, patch("agent.admission", agent.AdmissionController("{write: {rate: 0.5, burst: 2}}")):
+        responses = [client.put("/configurations", json=payload(hostmetrics={"collection_interval": f"{i}s"})) for i in range(3)]
+        other = client.put("/configurations", json=dict(payload(hostmetrics={}), configmap_name="other-config"))
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[2].headers["Retry-After"] == "2"
+    assert responses[2].json()["detail"]["reason"] == "rate"
+    assert other.status_code == 200
+    assert sample("agent_admission_rejected_total", kind="write", reason="rate") - rejected == 1
+
+
+def test_concurrency_cap_queues_then_rejects():
+    """
+    Requests over the concurrency cap wait in a bounded queue; once it is full they are rejected.
+    """
+    admission = agent.AdmissionController({"reload": {"rate": 0, "concurrency": 1, "queue": 1}})
+    key = ("monitoring",)
+
+    async def scenario():
+        order = []
+        release = asyncio.Event()
+
+        async def request(name):
+            async with admission.admit("reload", key):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.ensure_future(request("first"))
+        second = asyncio.ensure_future(request("second"))
+        await asyncio.sleep(0)
+        queued = sample("agent_admission_queue_depth", kind="reload")
+        try:
+            async with admission.admit("reload", key):
+                pass
+        except agent.RateLimited as e:
+            rejected = e
+        release.set()
+        await asyncio.gather(first, second)
+        return order, queued, rejected
+
+    order, queued, rejected = asyncio.run(scenario())
+
+    assert order == ["first", "second"]
+    assert queued == 1
+    assert rejected.status_code == 429 and rejected.detail["reason"] == "concurrency"
+    assert admission._running == {} and admission._waiting == {}
+
+
+def test_cancelled_waiter_frees_its_place():
+    """
+    A request cancelled while queued leaves the queue, and the slot goes to the next one.
+    """
+    admission = agent.AdmissionController({"write": {"rate": 0, "concurrency": 1, "queue": 2}})
+    key = ("monitoring", "collector-config")
+
+    async def scenario():
+        release = asyncio.Event()
+        done = []
+
+        async def request(name):
+            async with admission.admit("write", key):
+                await release.wait()
+                done.append(name)
+
+        tasks = [asyncio.ensure_future(request(name)) for name in ("first", "cancelled", "third")]
+        await asyncio.sleep(0)
+        tasks[1].cancel()
+        release.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return done
+
+    assert asyncio.run(scenario()) == ["first", "third"]
+    assert admission._running == {} and admission._waiting == {}
+
+
+def test_rate_limited_reload_is_not_a_500():
+    """
+    /reload over its limit answers 429 rather than the generic 500 of reload failures.
+    """
+    with patch("agent.admission", agent.AdmissionController({"reload": {"rate": 0.1, "burst": 1}})), \
+         patch("agent.find_pods_by_label", return_value=[]):
+        first = client.post("/reload", json={"namespace": "monitoring", "label_selector": "app=otel"})
+        second = client.post("/reload", json={"namespace": "monitoring", "label_selector": "app=otel"})
+
+    assert first.status_code == 500
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "10"
+
+
+def test_overlapping_namespace_sets_share_the_limit():
+    """
+    Reloads are limited per namespace: different sets that include the same namespace share its bucket.
+    """
+    with patch("agent.admission", agent.AdmissionController({"reload": {"rate": 0.1, "burst": 2}})), \
+         patch("agent.find_pods_by_label", return_value=[]):
+        responses = [client.post("/reload", json={"namespace": "monitoring", "namespaces": namespaces, "label_selector": "app=otel"})
+                     for namespaces in (["monitoring", "a"], ["b", "monitoring"], ["monitoring", "c"], ["d"])]
+
+    assert [response.status_code for response in responses] == [500, 500, 429, 500]
+    assert "monitoring" in responses[2].json()["detail"]["message"]
@@ -0,0 +1,80 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+
+class FakeCache:
+    def __init__(self, document):
+        self.document = document
+
+    def get(self, namespace, configmap_name):
+        return SimpleNamespace(document=self.document)
+
+
+def written(before, after):
+    return {"previous_hash": agent.config_hash(before), "hash": agent.config_hash(after)}
+
+
+async def reload_succeeded(pods, strategy="kubectl"):
+    return [{"namespace": namespace, "pod": pod, "status": "succeeded"} for namespace, pod in pods]
+
+
+def run_scheduler(cache, writes, delay=0.05):
+    """
+    Schedules the writes back to back, waits for the debounce and returns the scheduler and reload calls.
+    """
+    scheduler = agent.ReloadScheduler(delay=delay)
+    calls = []
+
+    async def fake_reload(pods, strategy="kubectl"):
+        calls.append(pods)
+        return await reload_succeeded(pods)
+
+    async def scenario():
+        statuses = [scheduler.schedule("monitoring", "collector-config", result) for result in writes]
+        await asyncio.sleep(delay * 4)
+        return statuses
+
+    with patch("agent.cache", cache), \
+         patch("agent.find_pods_by_label", return_value=["otel-a"]), \
+         patch("agent.reload_pods", side_effect=fake_reload):
+        statuses = asyncio.run(scenario())
+    return scheduler, calls, statuses
+
+
+def test_quick_edits_reload_once():
+    """
+    Several writes within the debounce window trigger a single reload.
+    """
+    a, b, c, d = {"v": 1}, {"v": 2}, {"v": 3}, {"v": 4}
+    scheduler, calls, statuses = run_scheduler(FakeCache(d), [written(a, b), written(b, c), written(c, d)])
+
+    assert statuses == ["scheduled"] * 3
+    assert calls == [[("monitoring", "otel-a")]]
+    assert scheduler.reloaded == 1
+
+
+def test_unchanged_configuration_is_not_reloaded():
+    """
+    A write that leaves collector.yaml identical does not schedule anything.
+    """
+    a = {"v": 1}
+    scheduler, calls, statuses = run_scheduler(FakeCache(a), [written(a, a)])
+
+    assert statuses == ["unchanged"]
+    assert calls == []
+
+
+def test_reverted_configuration_is_skipped():
+    """
+    Changing and reverting within the window ends on the reloaded hash, so the reload is skipped.
+    """
+    a, b = {"v": 1}, {"v": 2}
+    scheduler, calls, statuses = run_scheduler(FakeCache(a), [written(a, b), written(b, a)])
+
+    assert calls == []
+    assert scheduler.skipped == 1
@@ -0,0 +1,75 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import json
+from fastapi.testclient import TestClient
+from test_conflicts import ConflictingCoreV1, patched
+
+client = TestClient(agent.app)
+
+
+def bulk(items, **options):
+    response = client.post("/configurations/bulk", json=dict(options, items=items))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines[:-1], lines[-1]
+
+
+def item(operation, **fields):
+    return dict({"namespace": "monitoring", "configmap_name": "collector-config", "operation": operation}, **fields)
+
+
+def test_bulk_streams_one_line_per_item():
+    """
+    Every item gets its own NDJSON line, followed by a summary line.
+    """
+    v1 = ConflictingCoreV1(conflicts=0)
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch:
+        results, summary = bulk([
+            item("update", configuration={"receivers": {"hostmetrics": {}}}),
+            item("patch", operations=[{"op": "add", "path": "/exporters/debug", "value": {}}]),
+            item("remove", configuration={"receivers": {"otlp": {}}}),
+        ])
+
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    assert all(result["status"] == "succeeded" for result in results)
+    assert summary["summary"] == {"succeeded": 3, "failed": 0, "skipped": 0}
+    assert set(v1.document["receivers"]) == {"hostmetrics"}
+    assert v1.document["exporters"] == {"debug": {}}
+
+
+def test_bulk_dry_run_does_not_write():
+    """
+    Dry-run items report the diff they would apply without replacing the ConfigMap.
+    """
+    v1 = ConflictingCoreV1(conflicts=0)
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch:
+        results, summary = bulk([item("update", configuration={"receivers": {"hostmetrics": {}}})], dry_run=True)
+
+    assert results[0]["diff"]["added"] == [["receivers", "hostmetrics"]]
+    assert results[0]["written"] is False
+    assert v1.replaced_with == []
+    assert summary["dry_run"] is True
+
+
+def test_bulk_stop_on_failure():
+    """
+    After the first failure the items that have not started are skipped.
+    """
+    v1 = ConflictingCoreV1(conflicts=0)
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch:
+        results, summary = bulk([
+            item("patch", operations=[{"op": "remove", "path": "/receivers/missing"}]),
+            item("update", configuration={"receivers": {"hostmetrics": {}}}),
+            item("update", configuration={"receivers": {"kubeletstats": {}}}),
+        ], parallelism=1, stop_on_failure=True)
+
+    statuses = {result["index"]: result["status"] for result in results}
+    assert statuses == {0: "failed", 1: "skipped", 2: "skipped"}
+    assert "does not exist" in results[0]["error"]
+    assert v1.replaced_with == []
@@ -0,0 +1,192 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+from fastapi.testclient import TestClient
+from kubernetes import client as k8s
+from unittest.mock import patch
+
+
+def make_configmap(resource_version, collector_yaml):
+    return k8s.V1ConfigMap(
+        metadata=k8s.V1ObjectMeta(name="collector-config", namespace="monitoring", resource_version=resource_version),
+        data={"collector.yaml": collector_yaml},
+    )
+
+
+class FakeCoreV1:
+    def __init__(self, configmap):
+        self.configmap = configmap
+        self.reads = 0
+
+    def read_namespaced_config_map(self, name, namespace):
+        self.reads += 1
+        return self.configmap
+
+    def list_namespaced_config_map(self, namespace, **kwargs):
+        raise AssertionError("list is only called through the watch")
+
+
+class FakeKube:
+    def __init__(self, v1):
+        self.v1 = v1
+
+    def core_v1(self):
+        return self.v1
+
+
+class FakeWatch:
+    """
+    Replays a scripted list of watch events, an exception in the list is raised instead
+    and a callable is called (e.g. a write landing while the watch runs).
+    """
+    def __init__(self, events):
+        self.events = events
+        self.calls = []
+
+    def __call__(self):
+        return self
+
+    def stream(self, func, namespace, **kwargs):
+        self.calls.append(kwargs)
+        for event in self.events:
+            if isinstance(event, Exception):
+                raise event
+            if callable(event):
+                event()
+                continue
+            yield event
+
+    def stop(self):
+        pass
+
+
+def test_cache_lists_once_then_hits():
+    """
+    The first read goes to the API server, later reads are served from memory.
+    """
+    v1 = FakeCoreV1(make_configmap("1", "receivers: {otlp: {}}"))
+    cache = agent.ConfigMapCache(FakeKube(v1), watch_factory=FakeWatch([]), background=False)
+
+    cache.get("monitoring", "collector-config")
+    cache.watch_once(("monitoring", "collector-config"))
+    entry = cache.get("monitoring", "collector-config")
+
+    assert v1.reads == 1
+    assert entry.document == {"receivers": {"otlp": {}}}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_follows_watch_events():
+    """
+    MODIFIED events replace the parsed document, the watch resumes from the cached resourceVersion.
+    """
+    v1 = FakeCoreV1(make_configmap("1", "receivers: {otlp: {}}"))
+    events = [
+        {"type": "MODIFIED", "object": make_configmap("2", "receivers: {hostmetrics: {}}"), "raw_object": {}},
+        {"type": "BOOKMARK", "object": None, "raw_object": {"metadata": {"resourceVersion": "5"}}},
+    ]
+    fake_watch = FakeWatch(events)
+    cache = agent.ConfigMapCache(FakeKube(v1), watch_factory=fake_watch, background=False)
+
+    cache.get("monitoring", "collector-config")
+    cache.watch_once(("monitoring", "collector-config"))
+    entry = cache.get("monitoring", "collector-config")
+
+    assert fake_watch.calls[0]["resource_version"] == "1"
+    assert fake_watch.calls[0]["field_selector"] == "metadata.name=collector-config"
+    assert entry.document == {"receivers": {"hostmetrics": {}}}
+    assert entry.watch_version == "5"
+    assert v1.reads == 1
+
+
+def test_cache_relists_on_gone():
+    """
+    A 410 Gone ends the watch, the background loop relists before watching again.
+    """
+    v1 = FakeCoreV1(make_configmap("1", "receivers: {}"))
+    fake_watch = FakeWatch([k8s.ApiException(status=410, reason="Gone")])
+    cache = agent.ConfigMapCache(FakeKube(v1), watch_factory=fake_watch, background=False)
+    cache.get("monitoring", "collector-config")
+    v1.configmap = make_configmap("9", "receivers: {otlp: {}}")
+
+    def stop_after_relist(key):
+        if fake_watch.calls:
+            cache._stop.set()
+            return
+        return original(key)
+
+    original = cache.watch_once
+    with patch.object(cache, "watch_once", side_effect=stop_after_relist):
+        cache._run(("monitoring", "collector-config"))
+
+    assert v1.reads == 2
+    assert cache._entries[("monitoring", "collector-config")].resource_version == "9"
+
+
+def test_get_configurations_served_from_cache():
+    """
+    GET /configurations does not call the API server when the ConfigMap is cached.
+    """
+    v1 = FakeCoreV1(make_configmap("1", "service: {pipelines: {}}"))
+    cache = agent.ConfigMapCache(FakeKube(v1), watch_factory=FakeWatch([]), background=False)
+    cache.get("monitoring", "collector-config")
+    cache.watch_once(("monitoring", "collector-config"))
+
+    with patch("agent.cache", cache):
+        response = TestClient(agent.app).get("/configurations")
+
+    assert response.status_code == 200
+    assert response.json() == {"service": {"pipelines": {}}}
+    assert v1.reads == 1
+
+
+def modified(resource_version, collector_yaml):
+    return {"type": "MODIFIED", "object": make_configmap(resource_version, collector_yaml), "raw_object": {}}
+
+
+def test_event_of_own_write_keeps_entry():
+    """
+    The watch event for the version the agent just wrote keeps the stored entry and its index.
+    """
+    v1 = FakeCoreV1(make_configmap("1", "receivers: {}"))
+    key = ("monitoring", "collector-config")
+    index = object()
+    events = [
+        lambda: cache.store(*key, make_configmap("2", "receivers: {otlp: {}}"), {"receivers": {"otlp": {}}}, index, written=True),
+        modified("2", "receivers: {otlp: {}}"),
+    ]
+    cache = agent.ConfigMapCache(FakeKube(v1), watch_factory=FakeWatch(events), background=False)
+    cache.get(*key)
+    cache.watch_once(key)
+    entry = cache.get(*key)
+
+    assert entry.resource_version == "2"
+    assert entry._index is index
+    assert entry.awaiting_event is False
+
+
+def test_older_event_does_not_roll_back_a_write():
+    """
+    Events generated before the agent's last write are skipped until that write's own event arrives.
+    """
+    v1 = FakeCoreV1(make_configmap("1", "receivers: {}"))
+    key = ("monitoring", "collector-config")
+    seen = []
+    events = [
+        lambda: cache.store(*key, make_configmap("2", "receivers: {a: {}}"), {"receivers": {"a": {}}}, written=True),
+        lambda: cache.store(*key, make_configmap("3", "receivers: {b: {}}"), {"receivers": {"b": {}}}, written=True),
+        modified("2", "receivers: {a: {}}"),
+        lambda: seen.append(cache._entries[key].resource_version),
+        modified("3", "receivers: {b: {}}"),
+        modified("4", "receivers: {c: {}}"),
+    ]
+    cache = agent.ConfigMapCache(FakeKube(v1), watch_factory=FakeWatch(events), background=False)
+    cache.get(*key)
+    cache.watch_once(key)
+    entry = cache.get(*key)
+
+    assert seen == ["3"]
+    assert entry.resource_version == "4"
+    assert entry.document == {"receivers": {"c": {}}}
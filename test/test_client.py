@@ -0,0 +1,50 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+from unittest.mock import patch
+
+
+def fake_loader(token_file, calls):
+    def load(configuration):
+        calls.append(configuration)
+        configuration.host = "https://127.0.0.1:6443"
+        return str(token_file)
+    return load
+
+
+def test_client_is_shared(tmp_path):
+    """
+    The same CoreV1Api instance is returned for every call, configuration is loaded once.
+    """
+    token = tmp_path / "token"
+    token.write_text("a")
+    calls = []
+    kube = agent.KubernetesClient(pool_maxsize=8)
+    with patch("agent.load_kubernetes_config", side_effect=fake_loader(token, calls)):
+        first = kube.core_v1()
+        second = kube.core_v1()
+
+    assert first is second
+    assert len(calls) == 1
+    assert calls[0].connection_pool_maxsize == 8
+    kube.close()
+
+
+def test_client_reloads_rotated_token(tmp_path):
+    """
+    A changed token file reloads credentials into the existing configuration.
+    """
+    token = tmp_path / "token"
+    token.write_text("a")
+    calls = []
+    kube = agent.KubernetesClient(check_interval=0)
+    with patch("agent.load_kubernetes_config", side_effect=fake_loader(token, calls)):
+        v1 = kube.core_v1()
+        token.write_text("b")
+        os.utime(token, (0, 0))
+        assert kube.core_v1() is v1
+
+    assert len(calls) == 2
+    assert calls[0] is calls[1]
+    kube.close()
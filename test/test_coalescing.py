@@ -0,0 +1,104 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import yaml
+import threading
+from kubernetes import client as k8s
+from unittest.mock import patch
+
+
+class CountingCoreV1:
+    def __init__(self):
+        self.version = 1
+        self.document = {"receivers": {}, "processors": {}, "exporters": {}, "service": {}}
+        self.replaces = 0
+
+    def read_namespaced_config_map(self, name, namespace):
+        return k8s.V1ConfigMap(
+            metadata=k8s.V1ObjectMeta(name=name, namespace=namespace, resource_version=str(self.version)),
+            data={"collector.yaml": yaml.safe_dump(self.document)},
+        )
+
+    def replace_namespaced_config_map(self, name, namespace, body):
+        self.replaces += 1
+        self.document = yaml.safe_load(body.data["collector.yaml"])
+        self.version += 1
+        return self.read_namespaced_config_map(name, namespace)
+
+
+def fake_cluster():
+    v1 = CountingCoreV1()
+    kube = type("FakeKube", (), {"core_v1": lambda self: v1})()
+    return v1, patch("agent.kube", kube), patch("agent.cache", agent.ConfigMapCache(kube, background=False))
+
+
+def add_receiver(name):
+    def mutate(configmap_yaml):
+        configmap_yaml["receivers"][name] = {"order": len(configmap_yaml["receivers"])}
+        return configmap_yaml
+    return mutate
+
+
+def test_concurrent_mutations_share_one_write():
+    """
+    Mutations submitted within the window are applied in order and committed with one replace.
+    """
+    v1, kube_patch, cache_patch = fake_cluster()
+    queue = agent.ConfigMapWriteQueue(window=0.2)
+    with kube_patch, cache_patch:
+        futures = [queue.submit("monitoring", "collector-config", add_receiver(f"r{i}")) for i in range(20)]
+        results = [future.result(timeout=5) for future in futures]
+    queue.close()
+
+    assert v1.replaces == 1
+    assert all(result["batch_size"] == 20 for result in results)
+    assert [v1.document["receivers"][f"r{i}"]["order"] for i in range(20)] == list(range(20))
+
+
+def test_failing_mutation_does_not_affect_batch():
+    """
+    A mutation that raises gets its own error, the others are still committed.
+    """
+    def broken(configmap_yaml):
+        configmap_yaml["receivers"]["half-applied"] = {}
+        raise ValueError("bad payload")
+
+    v1, kube_patch, cache_patch = fake_cluster()
+    queue = agent.ConfigMapWriteQueue(window=0.2)
+    with kube_patch, cache_patch:
+        first = queue.submit("monitoring", "collector-config", add_receiver("a"))
+        failing = queue.submit("monitoring", "collector-config", broken)
+        last = queue.submit("monitoring", "collector-config", add_receiver("b"))
+        first.result(timeout=5)
+        last.result(timeout=5)
+        error = failing.exception(timeout=5)
+    queue.close()
+
+    assert isinstance(error, ValueError)
+    assert v1.replaces == 1
+    assert set(v1.document["receivers"]) == {"a", "b"}
+
+
+def test_threads_coalesce_through_update_configmap():
+    """
+    Concurrent PUT-style updates from many threads are merged into far fewer writes.
+    """
+    v1, kube_patch, cache_patch = fake_cluster()
+    queue = agent.ConfigMapWriteQueue(window=0.1)
+
+    def put(i):
+        agent.update_configmap("monitoring", "collector-config", {
+            "receivers": {f"r{i}": {}}, "processors": {}, "exporters": {}, "service": {},
+        })
+
+    with kube_patch, cache_patch, patch("agent.write_queue", queue):
+        threads = [threading.Thread(target=put, args=(i,)) for i in range(30)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    queue.close()
+
+    assert len(v1.document["receivers"]) == 30
+    assert v1.replaces < 30
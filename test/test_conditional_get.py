@@ -0,0 +1,74 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import gzip
+import json
+from fastapi.testclient import TestClient
+from test_conflicts import ConflictingCoreV1, patched, payload
+
+client = TestClient(agent.app)
+
+
+def collector():
+    v1 = ConflictingCoreV1(conflicts=0)
+    v1.document["service"] = {"pipelines": {"metrics": {"receivers": ["otlp"], "exporters": []}}}
+    v1.document["receivers"].update({f"prometheus/{i}": {"endpoint": f"10.0.0.{i}:9100"} for i in range(100)})
+    return v1
+
+
+def test_etag_and_not_modified():
+    """
+    GET returns an ETag; If-None-Match with it gives 304 until the configuration changes.
+    """
+    kube_patch, cache_patch = patched(collector())
+    with kube_patch, cache_patch:
+        first = client.get("/configurations")
+        etag = first.headers["ETag"]
+        unchanged = client.get("/configurations", headers={"If-None-Match": etag})
+        client.put("/configurations", json=payload(hostmetrics={}))
+        changed = client.get("/configurations", headers={"If-None-Match": etag})
+
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert "hostmetrics" in changed.json()["receivers"]
+
+
+def test_large_responses_are_compressed():
+    """
+    Bodies above the size threshold are gzip-encoded for clients that accept it.
+    """
+    kube_patch, cache_patch = patched(collector())
+    with kube_patch, cache_patch:
+        compressed = client.get("/configurations", headers={"Accept-Encoding": "gzip"})
+        identity = client.get("/configurations", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert int(compressed.headers["Content-Length"]) < int(identity.headers["Content-Length"])
+    assert compressed.json() == identity.json()
+    assert "Content-Encoding" not in identity.headers
+
+
+def test_field_filtering():
+    """
+    `fields` keeps only the requested paths, and has its own ETag.
+    """
+    kube_patch, cache_patch = patched(collector())
+    with kube_patch, cache_patch:
+        full = client.get("/configurations")
+        filtered = client.get("/configurations", params={"fields": "service.pipelines,/receivers/otlp,exporters.missing"})
+
+    assert filtered.json() == {"service": {"pipelines": {"metrics": {"receivers": ["otlp"], "exporters": []}}}, "receivers": {"otlp": {}}}
+    assert filtered.headers["ETag"] != full.headers["ETag"]
+
+
+def test_rendered_body_is_reused():
+    """
+    The encoded body is cached per ETag and coding, so an unchanged configuration is not serialized again.
+    """
+    body = agent.render_body('W/"test"', "gzip", {"receivers": {}})
+
+    assert agent.render_body('W/"test"', "gzip", {"ignored": True}) is body
+    assert json.loads(gzip.decompress(body)) == {"receivers": {}}
@@ -0,0 +1,85 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import yaml
+from fastapi.testclient import TestClient
+from kubernetes import client as k8s
+from unittest.mock import patch
+
+client = TestClient(agent.app)
+
+
+class ConflictingCoreV1:
+    """
+    ConfigMap API that rejects writes whose resourceVersion is not the current one,
+    and lets another writer change the ConfigMap `conflicts` times before each replace.
+    """
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        self.version = 1
+        self.document = {"receivers": {"otlp": {}}, "processors": {}, "exporters": {}, "service": {}}
+        self.replaced_with = []
+
+    def read_namespaced_config_map(self, name, namespace):
+        return k8s.V1ConfigMap(
+            metadata=k8s.V1ObjectMeta(name=name, namespace=namespace, resource_version=str(self.version)),
+            data={"collector.yaml": yaml.safe_dump(self.document)},
+        )
+
+    def replace_namespaced_config_map(self, name, namespace, body):
+        self.replaced_with.append(body.metadata.resource_version)
+        if self.conflicts:
+            self.conflicts -= 1
+            self.document["receivers"]["concurrent-%d" % self.version] = {}
+            self.version += 1
+        if body.metadata.resource_version != str(self.version):
+            raise k8s.ApiException(status=409, reason="Conflict")
+        self.document = yaml.safe_load(body.data["collector.yaml"])
+        self.version += 1
+        return self.read_namespaced_config_map(name, namespace)
+
+
+def patched(v1):
+    kube = type("FakeKube", (), {"core_v1": lambda self: v1})()
+    cache = agent.ConfigMapCache(kube, background=False)
+    return patch("agent.kube", kube), patch("agent.cache", cache)
+
+
+def payload(**receivers):
+    return {
+        "namespace": "monitoring",
+        "configmap_name": "collector-config",
+        "receivers": receivers,
+        "processors": {},
+        "exporters": {},
+        "service": {},
+    }
+
+
+def test_put_retries_after_conflict():
+    """
+    A 409 re-reads the ConfigMap and re-applies the merge, keeping the concurrent change.
+    """
+    v1 = ConflictingCoreV1(conflicts=1)
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch:
+        response = client.put("/configurations", json=payload(hostmetrics={"collection_interval": "5s"}))
+
+    assert response.status_code == 200
+    assert response.json()["retries"] == 1
+    assert v1.replaced_with == ["1", "2"]
+    assert set(v1.document["receivers"]) == {"otlp", "concurrent-1", "hostmetrics"}
+
+
+def test_put_gives_up_after_max_retries():
+    """
+    Persistent conflicts end with 409 after the configured number of retries.
+    """
+    v1 = ConflictingCoreV1(conflicts=100)
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch, patch("agent.WRITE_MAX_RETRIES", 2), patch("agent.WRITE_BACKOFF_BASE", 0):
+        response = client.put("/configurations", json=payload(hostmetrics={}))
+
+    assert response.status_code == 409
+    assert len(v1.replaced_with) == 3
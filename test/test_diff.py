@@ -0,0 +1,39 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+from fastapi.testclient import TestClient
+from test_conflicts import ConflictingCoreV1, patched, payload
+
+client = TestClient(agent.app)
+
+
+def test_diff_reports_paths():
+    """
+    Added, changed and removed keys are reported as key paths; names with dots stay intact.
+    """
+    before = {"receivers": {"otlp": {"protocols": {"grpc": {}}}, "hostmetrics": {"collection_interval": "30s"}}}
+    after = {"receivers": {"otlp/v1.2": {}, "hostmetrics": {"collection_interval": "5s"}}}
+
+    assert agent.diff_configmap(before, after) == {
+        "added": [["receivers", "otlp/v1.2"]],
+        "changed": [["receivers", "hostmetrics", "collection_interval"]],
+        "removed": [["receivers", "otlp"]],
+    }
+
+
+def test_identical_put_skips_write():
+    """
+    Repeating the same PUT is answered without replacing the ConfigMap.
+    """
+    v1 = ConflictingCoreV1(conflicts=0)
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch:
+        first = client.put("/configurations", json=payload(hostmetrics={"collection_interval": "5s"}))
+        second = client.put("/configurations", json=payload(hostmetrics={"collection_interval": "5s"}))
+
+    assert first.json()["written"] is True
+    assert first.json()["diff"]["added"] == [["receivers", "hostmetrics"]]
+    assert second.json()["written"] is False
+    assert second.json()["diff"] == {"added": [], "changed": [], "removed": []}
+    assert len(v1.replaced_with) == 1
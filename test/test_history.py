@@ -0,0 +1,63 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from test_conflicts import ConflictingCoreV1, patched, payload
+
+client = TestClient(agent.app)
+TARGET = {"namespace": "monitoring", "configmap_name": "collector-config"}
+
+
+def test_history_keeps_only_the_newest_document():
+    """
+    Older versions are stored as deltas and rebuilt on demand; eviction drops the oldest.
+    """
+    history = agent.ConfigurationHistory(max_versions=3)
+    documents = [{"receivers": {"otlp": {"port": i}}, "exporters": {}} for i in range(4)]
+    documents[2]["exporters"]["logging"] = {}
+    for before, after in zip(documents, documents[1:]):
+        history.record("ns", "cm", before, agent.config_hash(before), after, agent.config_hash(after))
+
+    versions = history.versions("ns", "cm")
+    assert [version["version"] for version in versions] == [agent.config_hash(document) for document in reversed(documents[1:])]
+    assert versions[0]["current"] is True
+    assert history.document("ns", "cm", versions[1]["version"][:12]) == documents[2]
+    assert history.document("ns", "cm", versions[2]["version"]) == documents[1]
+
+
+def test_rollback_restores_previous_version():
+    """
+    Rolling back writes the recorded content; rolling back to the current version writes nothing.
+    """
+    v1 = ConflictingCoreV1(conflicts=0)
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch, patch("agent.history", agent.ConfigurationHistory()):
+        client.put("/configurations", json=payload(hostmetrics={"collection_interval": "5s"}))
+        client.put("/configurations", json=payload(hostmetrics={"collection_interval": "10s"}))
+
+        versions = client.get("/configurations/history", params=TARGET).json()["versions"]
+        assert len(versions) == 3
+
+        diff = client.get("/configurations/history/diff", params=dict(TARGET, from_version=versions[2]["version"])).json()
+        assert diff["diff"]["added"] == [["receivers", "hostmetrics"]]
+
+        response = client.post("/configurations/rollback", json=dict(TARGET, version=versions[1]["version"][:8]))
+        assert response.status_code == 200
+        assert response.json()["written"] is True
+        assert v1.document["receivers"]["hostmetrics"] == {"collection_interval": "5s"}
+
+        response = client.post("/configurations/rollback", json=dict(TARGET, version=versions[1]["version"]))
+        assert response.json()["written"] is False
+        assert len(v1.replaced_with) == 3
+
+
+def test_rollback_unknown_version():
+    """
+    Rolling back to a version that was never recorded returns 404.
+    """
+    with patch("agent.history", agent.ConfigurationHistory()):
+        response = client.post("/configurations/rollback", json=dict(TARGET, version="deadbeef"))
+
+    assert response.status_code == 404
@@ -0,0 +1,120 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import copy
+import functools
+import httpx
+import time
+from fastapi.testclient import TestClient
+from kubernetes import client as k8s
+from unittest.mock import patch
+
+client = TestClient(agent.app)
+
+
+class FakeCoordinationV1:
+    """
+    Lease API keeping a single Lease, with resourceVersion preconditions on replace.
+    """
+    def __init__(self):
+        self.lease = None
+        self.version = 0
+
+    def _stored(self, lease):
+        self.version += 1
+        lease = copy.deepcopy(lease)
+        lease.metadata.resource_version = str(self.version)
+        self.lease = lease
+        return copy.deepcopy(lease)
+
+    def read_namespaced_lease(self, name, namespace):
+        if self.lease is None:
+            raise k8s.ApiException(status=404, reason="Not Found")
+        return copy.deepcopy(self.lease)
+
+    def create_namespaced_lease(self, namespace, body):
+        if self.lease is not None:
+            raise k8s.ApiException(status=409, reason="AlreadyExists")
+        return self._stored(body)
+
+    def replace_namespaced_lease(self, name, namespace, body):
+        if body.metadata.resource_version != self.lease.metadata.resource_version:
+            raise k8s.ApiException(status=409, reason="Conflict")
+        return self._stored(body)
+
+
+def electors(lease_duration=10):
+    api = FakeCoordinationV1()
+    kube = type("FakeKube", (), {"coordination_v1": lambda self: api})()
+    return api, [agent.LeaderElector(kube, enabled=True, identity=name, address=f"http://{name}:8000", lease_duration=lease_duration)
+                 for name in ("agent-a", "agent-b")]
+
+
+def test_release_hands_over_immediately():
+    """
+    The first replica takes the lease, the second follows it, and takes over as soon as it is released.
+    """
+    api, (a, b) = electors()
+
+    assert a.try_acquire() is True
+    assert b.try_acquire() is False
+    assert (a.is_leader, b.is_leader) == (True, False)
+    assert b.leader_address == "http://agent-a:8000"
+
+    a.release()
+    assert b.try_acquire() is True
+    assert b.is_leader and not a.is_leader
+    assert api.lease.spec.lease_transitions == 1
+
+
+def test_expired_lease_is_taken_over():
+    """
+    A lease whose record does not change for its duration is taken over by a follower.
+    """
+    api, (a, b) = electors(lease_duration=1)
+    a.try_acquire()
+    assert b.try_acquire() is False
+
+    time.sleep(1.05)
+    assert not a.is_leader
+    assert b.try_acquire() is True
+    assert api.lease.spec.holder_identity == "agent-b"
+
+
+def test_follower_forwards_writes_to_leader():
+    """
+    Writes and history reads received by a follower are forwarded to the leader; other reads are served locally.
+    """
+    forwarded = []
+
+    def leader_app(request):
+        forwarded.append(request)
+        return httpx.Response(200, json={"message": "from leader"})
+
+    follower = agent.LeaderElector(None, enabled=True, identity="agent-b")
+    follower.leader_identity, follower.leader_address = "agent-a", "http://agent-a:8000"
+    with patch("agent.leader", follower), \
+         patch("httpx.AsyncClient", functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(leader_app))):
+        response = client.put("/configurations?dry=1", json={"namespace": None})
+        history = client.get("/configurations/history", params={"namespace": "monitoring", "configmap_name": "collector-config"})
+        status = client.get("/leader").json()
+
+    assert response.json() == {"message": "from leader"}
+    assert str(forwarded[0].url) == "http://agent-a:8000/configurations?dry=1"
+    assert forwarded[0].headers[agent.FORWARDED_HEADER] == "agent-b"
+    assert history.json() == {"message": "from leader"}
+    assert str(forwarded[1].url) == "http://agent-a:8000/configurations/history?namespace=monitoring&configmap_name=collector-config"
+    assert len(forwarded) == 2
+    assert status == {"enabled": True, "identity": "agent-b", "is_leader": False, "leader": "agent-a", "leader_address": "http://agent-a:8000"}
+
+
+def test_no_leader_returns_503():
+    """
+    Without a known leader, writes are refused with 503 and Retry-After.
+    """
+    with patch("agent.leader", agent.LeaderElector(None, enabled=True, identity="agent-b")):
+        response = client.post("/reload", json={"namespace": "monitoring"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
@@ -0,0 +1,100 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import io
+import json
+import logging
+from fastapi.testclient import TestClient
+from test_conflicts import ConflictingCoreV1, patched, payload
+
+client = TestClient(agent.app)
+
+
+def capture(**options):
+    stream = io.StringIO()
+    agent.configure_logging(stream=stream, **options)
+    return stream
+
+
+def records(stream):
+    agent.configure_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_logs_are_json_with_request_id():
+    """
+    Records are JSON lines carrying the request ID of the request that produced them.
+    """
+    stream = capture(level="DEBUG", sample_rate=1)
+    response = client.put("/configurations", headers={"X-Request-ID": "req-1"}, json={
+        "namespace": None, "configmap_name": None, "receivers": {}, "processors": {}, "exporters": {}, "service": {},
+    })
+    logged = records(stream)
+
+    assert response.headers["X-Request-ID"] == "req-1"
+    assert any(entry["message"] == "No Kubeconfig, entering DEBUG mode" and entry["request_id"] == "req-1" for entry in logged)
+    access = [entry for entry in logged if entry["message"] == "PUT /configurations 200"]
+    assert access[0]["status"] == 200 and access[0]["level"] == "INFO"
+
+
+def test_success_logs_are_sampled_and_errors_kept():
+    """
+    Sampled success logs are dropped at a zero rate; warnings are always written.
+    """
+    stream = capture(level="INFO", sample_rate=0)
+    client.get("/configurations/cache")
+    client.patch("/configurations", json={"namespace": None, "configmap_name": None, "operations": [{"op": "move", "path": "/a"}]})
+    logged = records(stream)
+
+    assert [entry["message"] for entry in logged] == ["PATCH /configurations 422"]
+    assert logged[0]["level"] == "WARNING"
+
+
+def test_debug_configuration_dump_is_skipped_at_info():
+    """
+    The configuration dump is not formatted at all unless DEBUG is enabled.
+    """
+    stream = capture(level="INFO", sample_rate=1)
+    assert not logging.getLogger("agent").isEnabledFor(logging.DEBUG)
+    client.post("/validate", json={"namespace": None, "configmap_name": None})
+    logged = records(stream)
+
+    assert not any(entry["message"].startswith("TESTING") for entry in logged)
+
+
+def test_write_logs_carry_request_id():
+    """
+    Logs of a queued ConfigMap write, such as the conflict retry, carry the request ID of the caller.
+    """
+    kube_patch, cache_patch = patched(ConflictingCoreV1(conflicts=1))
+    stream = capture(level="INFO", sample_rate=1)
+    with kube_patch, cache_patch:
+        response = client.put("/configurations", headers={"X-Request-ID": "req-write"}, json=payload(hostmetrics={}))
+    logged = records(stream)
+
+    assert response.status_code == 200
+    conflict = [entry for entry in logged if entry["message"].startswith("Conflict writing ConfigMap")]
+    assert conflict and conflict[0]["request_id"] == "req-write"
+
+
+def test_coalesced_write_logs_carry_every_request_id():
+    """
+    A commit shared by several requests logs the request IDs of the whole batch.
+    """
+    kube_patch, cache_patch = patched(ConflictingCoreV1(conflicts=1))
+    queue = agent.ConfigMapWriteQueue(window=0.2)
+    stream = capture(level="INFO", sample_rate=1)
+    with kube_patch, cache_patch:
+        futures = []
+        for name in ("req-a", "req-b"):
+            token = agent.request_id.set(name)
+            futures.append(queue.submit("monitoring", "collector-config", lambda document, name=name: dict(document, **{name: {}})))
+            agent.request_id.reset(token)
+        for future in futures:
+            future.result()
+    queue.close()
+    logged = records(stream)
+
+    conflict = [entry for entry in logged if entry["message"].startswith("Conflict writing ConfigMap")]
+    assert conflict and conflict[0]["request_id"] == "req-a,req-b"
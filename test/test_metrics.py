@@ -0,0 +1,51 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from test_conflicts import ConflictingCoreV1, patched, payload
+
+client = TestClient(agent.app)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_metrics_count_stages_and_conflicts():
+    """
+    A write with one conflict is visible in the stage histograms and the conflict/retry/no-op counters.
+    """
+    before = {
+        "conflicts": sample("agent_configmap_conflicts_total"),
+        "retries": sample("agent_configmap_retries_total"),
+        "noop": sample("agent_configmap_noop_writes_total"),
+        "merge": sample("agent_stage_duration_seconds_count", stage="merge"),
+        "write": sample("agent_stage_duration_seconds_count", stage="k8s_write"),
+        "put": sample("agent_request_duration_seconds_count", method="PUT", endpoint="/configurations", status="200"),
+    }
+    v1 = ConflictingCoreV1(conflicts=1)
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch:
+        client.put("/configurations", json=payload(hostmetrics={}))
+        client.put("/configurations", json=payload(hostmetrics={}))
+
+    assert sample("agent_configmap_conflicts_total") - before["conflicts"] == 1
+    assert sample("agent_configmap_retries_total") - before["retries"] == 1
+    assert sample("agent_configmap_noop_writes_total") - before["noop"] == 1
+    assert sample("agent_stage_duration_seconds_count", stage="merge") - before["merge"] == 3
+    assert sample("agent_stage_duration_seconds_count", stage="k8s_write") - before["write"] == 2
+    assert sample("agent_request_duration_seconds_count", method="PUT", endpoint="/configurations", status="200") - before["put"] == 2
+
+
+def test_metrics_endpoint():
+    """
+    /metrics serves the Prometheus text format.
+    """
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "agent_stage_duration_seconds_bucket" in response.text
+    assert "agent_write_queue_depth" in response.text
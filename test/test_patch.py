@@ -0,0 +1,68 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agent import app
+from fastapi.testclient import TestClient
+
+client = TestClient(app)
+
+
+def patch_request(*operations):
+    return client.patch("/configurations", json={
+        "namespace": None,
+        "configmap_name": None,
+        "operations": list(operations),
+    })
+
+
+def test_patch_json_pointer_operations():
+    """
+    Test PATCH with RFC 6902 operations addressed by JSON Pointer (DEBUG mode).
+    """
+    response = patch_request(
+        {"op": "replace", "path": "/receivers/hostmetrics/collection_interval", "value": "5s"},
+        {"op": "add", "path": "/service/pipelines/metrics/exporters/-", "value": "logging"},
+        {"op": "remove", "path": "/processors/filter~1specific_metric"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["diff"] == {
+        "added": [],
+        "changed": [["receivers", "hostmetrics", "collection_interval"], ["service", "pipelines", "metrics", "exporters"]],
+        "removed": [["processors", "filter/specific_metric"]],
+    }
+
+
+def test_patch_dotted_and_list_paths():
+    """
+    Test PATCH with dotted paths and key lists, including a key containing dots.
+    """
+    response = patch_request(
+        {"op": "copy", "from": "receivers.otlp", "path": ["receivers", "otlp/v1.2"]},
+        {"op": "move", "from": "receivers.k8s_events", "path": "receivers.events"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["diff"]["added"] == [["receivers", "otlp/v1.2"], ["receivers", "events"]]
+    assert response.json()["diff"]["removed"] == [["receivers", "k8s_events"]]
+
+
+def test_patch_failed_test_operation():
+    """
+    Test PATCH where a test operation does not match: nothing is applied.
+    """
+    response = patch_request(
+        {"op": "remove", "path": "/receivers/otlp"},
+        {"op": "test", "path": "/receivers/hostmetrics/collection_interval", "value": "1h"},
+    )
+
+    assert response.status_code == 409
+
+
+def test_patch_missing_path():
+    """
+    Test PATCH on a path that does not exist.
+    """
+    response = patch_request({"op": "replace", "path": "/receivers/missing/endpoint", "value": "x"})
+
+    assert response.status_code == 422
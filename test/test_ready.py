@@ -0,0 +1,154 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import subprocess
+from fastapi.testclient import TestClient
+from kubernetes import client as k8s
+from unittest.mock import patch
+
+client = TestClient(agent.app)
+
+TARGETS = """
+- {name: edge, namespace: monitoring, configmap_name: edge-collector}
+- {name: operator, namespace: observability, kind: opentelemetrycollector, resource_name: otel}
+"""
+
+
+class FakeKube:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.started = 0
+        self.versions = 0
+
+    def start(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("API server unreachable")
+        self.started += 1
+
+    def api(self, api_class):
+        return self
+
+    def get_code(self):
+        self.versions += 1
+
+
+class FakeCache:
+    """
+    Raises the given errors on the first reads, in order, then reads successfully.
+    """
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.attempts = 0
+        self.read = []
+
+    def get(self, namespace, configmap_name):
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.read.append((namespace, configmap_name))
+
+
+NOT_FOUND = k8s.ApiException(status=404, reason="Not Found")
+REFUSED = ConnectionRefusedError("Connection refused")
+
+
+def test_ready_after_warm_up():
+    """
+    /ready is 503 until the API server has answered and every ConfigMap target has been read once.
+    """
+    kube, cache = FakeKube(), FakeCache()
+    readiness = agent.Readiness(kube, cache, agent.TargetRegistry(inline=TARGETS))
+    with patch("agent.readiness", readiness):
+        before = client.get("/ready")
+        readiness.warm_up()
+        after = client.get("/ready")
+
+    assert before.status_code == 503 and before.json()["ready"] is False
+    assert after.status_code == 200 and after.json()["warm_ms"] is not None
+    assert kube.started == 1
+    assert cache.read == [("monitoring", "edge-collector")]
+
+
+def test_unreadable_target_does_not_block_readiness():
+    """
+    A target the API server rejects is reported in /ready without blocking it.
+    """
+    readiness = agent.Readiness(FakeKube(), FakeCache(NOT_FOUND), agent.TargetRegistry(inline=TARGETS))
+    readiness.warm_up()
+    with patch("agent.readiness", readiness):
+        response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["targets"] == {"edge": "404 Not Found"}
+
+
+def test_unreachable_api_server_keeps_ready_503():
+    """
+    Connection errors while reading the targets are retried; /ready stays 503 until the API server answers.
+    """
+    cache = FakeCache(REFUSED, REFUSED)
+    readiness = agent.Readiness(FakeKube(), cache, agent.TargetRegistry(inline=TARGETS), retry_delay=0)
+    attempts = []
+
+    def wait(delay):
+        attempts.append((readiness.ready, readiness.error))
+        return delay
+
+    with patch.object(readiness, "_wait", side_effect=wait):
+        readiness.warm_up()
+
+    assert attempts == [(False, "Connection refused"), (False, "Connection refused")]
+    assert readiness.ready and readiness.error is None
+    assert cache.attempts == 3
+
+
+def test_ready_without_configmap_targets_checks_the_api_server():
+    """
+    Without ConfigMap targets, readiness still waits for one answer from the API server.
+    """
+    kube = FakeKube()
+    operator_only = "- {name: operator, namespace: observability, kind: opentelemetrycollector, resource_name: otel}"
+    readiness = agent.Readiness(kube, FakeCache(), agent.TargetRegistry(inline=operator_only))
+    readiness.warm_up()
+
+    assert readiness.ready
+    assert kube.versions == 1
+
+
+def test_strict_readiness_waits_for_every_target():
+    """
+    With strict readiness, target reads are retried and /ready stays 503 until they all succeed.
+    """
+    cache = FakeCache(NOT_FOUND, NOT_FOUND)
+    readiness = agent.Readiness(FakeKube(), cache, agent.TargetRegistry(inline=TARGETS), strict=True, retry_delay=0)
+    assert readiness._warm_targets() == ({"edge": "404 Not Found"}, None) and not readiness.ready
+    readiness.warm_up()
+
+    assert readiness.ready
+    assert readiness.target_errors == {}
+    assert cache.read == [("monitoring", "edge-collector")]
+
+
+def test_warm_up_retries_until_the_api_server_answers():
+    """
+    A failed warm-up is reported and retried; the error is cleared once it succeeds.
+    """
+    readiness = agent.Readiness(FakeKube(failures=2), FakeCache(), agent.TargetRegistry(inline=TARGETS), retry_delay=0)
+    readiness.warm_up()
+
+    assert readiness.ready
+    assert readiness.error is None
+
+
+def test_kubernetes_client_is_imported_lazily():
+    """
+    Importing the agent does not import the Kubernetes client or httpx; the first API call does.
+    """
+    code = ("import sys, agent; print('kubernetes' in sys.modules, 'httpx' in sys.modules); "
+            "agent.client.Configuration; print('kubernetes' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(os.path.dirname(__file__), '..'),
+                            capture_output=True, text=True, check=True).stdout.split()
+
+    assert output == ["False", "False", "True"]
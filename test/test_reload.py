@@ -1,10 +1,13 @@
 import pytest
+import asyncio
 from fastapi.testclient import TestClient
 from unittest.mock import patch
+from types import SimpleNamespace
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from agent import app
+from kubernetes import client as k8s
 
 client = TestClient(app)
 
@@ -18,7 +21,7 @@ def test_reload_success():
     """
     Simulates that the pod is found and the command is executed successfully.
     """
-    with patch("agent.find_pod_by_label", return_value="otel-pod-123"), \
+    with patch("agent.find_pods_by_label", return_value=["otel-pod-123"]), \
          patch("agent.send_signal_to_pod", return_value={"message": "Signal HUP sent to pod 'otel-pod-123'."}):
 
         response = client.post("/reload", json=reload_payload)
@@ -30,7 +33,7 @@ def test_reload_pod_not_found():
     """
     Simulates that the pod is not found.
     """
-    with patch("agent.find_pod_by_label", return_value=None):
+    with patch("agent.find_pods_by_label", return_value=[]):
         response = client.post("/reload", json=reload_payload)
         assert response.status_code == 500
         assert "OpenTelemetry pod not found" in response.json()["detail"]
@@ -40,9 +43,222 @@ def test_reload_command_failure():
     """
     Simulates that the pod is found but kubectl fails.
     """
-    with patch("agent.find_pod_by_label", return_value="otel-pod-123"), \
+    with patch("agent.find_pods_by_label", return_value=["otel-pod-123"]), \
          patch("agent.send_signal_to_pod", side_effect=Exception("Command failed")):
 
         response = client.post("/reload", json=reload_payload)
         assert response.status_code == 500
         assert "Command failed" in response.json()["detail"]
+
+
+class FakeProcess:
+    def __init__(self, returncode, stderr=b""):
+        self.returncode = returncode
+        self.stderr = stderr
+
+    async def communicate(self):
+        return b"", self.stderr
+
+
+def test_reload_runs_kubectl_without_blocking():
+    """
+    kubectl debug is started as an asyncio subprocess against the pod that was found.
+    """
+    async def fake_exec(*command, **kwargs):
+        fake_exec.command = command
+        return FakeProcess(0)
+
+    with patch("agent.find_pods_by_label", return_value=["otel-pod-123"]), \
+         patch("agent.asyncio.create_subprocess_exec", side_effect=fake_exec):
+        response = client.post("/reload", json=reload_payload)
+
+    assert response.status_code == 200
+    assert fake_exec.command[:4] == ("kubectl", "debug", "-it", "otel-pod-123")
+
+
+def test_reload_reports_kubectl_error():
+    """
+    A non-zero exit status of kubectl is reported with its stderr.
+    """
+    async def fake_exec(*command, **kwargs):
+        return FakeProcess(1, b"ephemeral containers are disabled")
+
+    with patch("agent.find_pods_by_label", return_value=["otel-pod-123"]), \
+         patch("agent.asyncio.create_subprocess_exec", side_effect=fake_exec):
+        response = client.post("/reload", json=reload_payload)
+
+    assert response.status_code == 500
+    assert "ephemeral containers are disabled" in response.json()["detail"]
+
+
+class FakeWorkloads:
+    """
+    Pod owned by a ReplicaSet owned by a Deployment; records patches to the Deployment.
+    """
+    def __init__(self):
+        self.patches = []
+
+    def core_v1(self):
+        return self
+
+    def api(self, api_class):
+        return self
+
+    def read_namespaced_pod(self, name, namespace):
+        return k8s.V1Pod(metadata=k8s.V1ObjectMeta(name=name, owner_references=[
+            k8s.V1OwnerReference(api_version="apps/v1", kind="ReplicaSet", name="otel-6d4f", uid="1", controller=True)]))
+
+    def read_namespaced_replica_set(self, name, namespace):
+        return SimpleNamespace(metadata=k8s.V1ObjectMeta(name=name, owner_references=[
+            k8s.V1OwnerReference(api_version="apps/v1", kind="Deployment", name="otel", uid="2", controller=True)]))
+
+    def patch_namespaced_deployment(self, name, namespace, body):
+        self.patches.append((name, namespace, body))
+
+
+def test_reload_rollout_restarts_owning_deployment():
+    """
+    The rollout strategy patches the restartedAt annotation on the Deployment behind the pod.
+    """
+    workloads = FakeWorkloads()
+    with patch("agent.find_pods_by_label", return_value=["otel-6d4f-abcde"]), \
+         patch("agent.kube", workloads):
+        response = client.post("/reload", json=dict(reload_payload, strategy="rollout"))
+
+    assert response.status_code == 200
+    assert response.json()["pods"][0]["strategy"] == "rollout"
+    assert "elapsed_ms" in response.json()["pods"][0]
+    name, namespace, body = workloads.patches[0]
+    assert (name, namespace) == ("otel", "monitoring")
+    assert "kubectl.kubernetes.io/restartedAt" in body["spec"]["template"]["metadata"]["annotations"]
+
+
+def test_reload_falls_back_to_kubectl():
+    """
+    When the requested strategy fails, kubectl debug is used and the failure is reported.
+    """
+    with patch("agent.find_pods_by_label", return_value=["otel-pod-123"]), \
+         patch("agent.exec_signal_in_pod", side_effect=Exception("exec forbidden")), \
+         patch("agent.send_signal_to_pod", return_value={"message": "Signal HUP sent to pod 'otel-pod-123'."}):
+        response = client.post("/reload", json=dict(reload_payload, strategy="exec"))
+
+    assert response.status_code == 200
+    assert response.json()["pods"][0]["strategy"] == "kubectl"
+    assert response.json()["pods"][0]["fallback_from"] == "exec"
+
+
+def test_reload_rejects_unsafe_signal():
+    """
+    Only plain signal names are accepted since the signal ends up in a shell command.
+    """
+    response = client.post("/reload", json=dict(reload_payload, signal="HUP 1; rm -rf /"))
+    assert response.status_code == 422
+
+
+def test_reload_fans_out_to_all_pods():
+    """
+    Every Ready pod in every requested namespace is reloaded; failures are reported per pod.
+    """
+    async def fake_signal(namespace, pod_name, signal="HUP", container=None):
+        if pod_name == "otel-b":
+            raise Exception("Command failed")
+        return {"message": f"Signal {signal} sent to pod '{pod_name}'."}
+
+    pods = {"monitoring": ["otel-a", "otel-b"], "edge": ["otel-c"]}
+    with patch("agent.find_pods_by_label", side_effect=lambda namespace, label: pods[namespace]), \
+         patch("agent.send_signal_to_pod", side_effect=fake_signal):
+        response = client.post("/reload", json=dict(reload_payload, namespaces=["monitoring", "edge"]))
+
+    body = response.json()
+    assert response.status_code == 200
+    assert (body["succeeded"], body["failed"]) == (2, 1)
+    assert {(pod["namespace"], pod["pod"], pod["status"]) for pod in body["pods"]} == {
+        ("monitoring", "otel-a", "succeeded"), ("monitoring", "otel-b", "failed"), ("edge", "otel-c", "succeeded")}
+
+
+def test_reload_per_pod_timeout():
+    """
+    A pod that does not answer within pod_timeout is reported as failed without delaying the others.
+    """
+    async def fake_signal(namespace, pod_name, signal="HUP", container=None):
+        if pod_name == "otel-slow":
+            await asyncio.sleep(5)
+        return {"message": f"Signal {signal} sent to pod '{pod_name}'."}
+
+    with patch("agent.find_pods_by_label", return_value=["otel-slow", "otel-fast"]), \
+         patch("agent.send_signal_to_pod", side_effect=fake_signal):
+        response = client.post("/reload", json=dict(reload_payload, pod_timeout=0.2))
+
+    results = {pod["pod"]: pod for pod in response.json()["pods"]}
+    assert response.status_code == 200
+    assert results["otel-fast"]["status"] == "succeeded"
+    assert "timed out" in results["otel-slow"]["error"]
+
+
+def test_reload_timeout_kills_kubectl():
+    """
+    A kubectl process cancelled by the per-pod timeout is killed before its reload slot is released.
+    """
+    spawn = asyncio.create_subprocess_exec
+    processes = []
+
+    async def slow_exec(*command, **kwargs):
+        process = await spawn(sys.executable, "-c", "import time; time.sleep(30)", **kwargs)
+        processes.append(process)
+        return process
+
+    with patch("agent.find_pods_by_label", return_value=["otel-pod-123"]), \
+         patch("agent.asyncio.create_subprocess_exec", side_effect=slow_exec):
+        response = client.post("/reload", json=dict(reload_payload, pod_timeout=0.3))
+
+    assert response.status_code == 500
+    assert "timed out" in response.json()["detail"]
+    assert processes[0].returncode is not None
+    with pytest.raises(ProcessLookupError):
+        os.kill(processes[0].pid, 0)
+
+
+class FakePods:
+    def core_v1(self):
+        return self
+
+    def read_namespaced_pod(self, name, namespace):
+        return k8s.V1Pod(metadata=k8s.V1ObjectMeta(name=name), status=k8s.V1PodStatus(pod_ip="10.0.0.5"))
+
+
+def http_reload(body):
+    import functools
+    import httpx
+    posted = []
+
+    def collector(request):
+        posted.append(str(request.url))
+        return httpx.Response(200)
+
+    with patch("agent.find_pods_by_label", return_value=["otel-pod-123"]), patch("agent.kube", FakePods()), \
+         patch("httpx.AsyncClient", functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(collector))):
+        response = client.post("/reload", json=dict(reload_payload, strategy="http", fallback=False, **body))
+    return response, posted
+
+
+def test_http_reload_only_targets_the_pod():
+    """
+    The http strategy posts to a port and path of the pod itself; an arbitrary reload_url is rejected.
+    """
+    response, posted = http_reload({"reload_port": 8080, "reload_path": "/reload"})
+    rejected, _ = http_reload({"reload_url": "http://internal-service/admin"})
+
+    assert response.status_code == 200
+    assert posted == ["http://10.0.0.5:8080/reload"]
+    assert rejected.status_code == 422
+
+
+def test_http_reload_url_template_keeps_other_braces():
+    """
+    Only {pod_ip}, {pod_name} and {namespace} are substituted in AGENT_COLLECTOR_RELOAD_URL.
+    """
+    with patch("agent.COLLECTOR_RELOAD_URL", "http://{pod_ip}:13133/reload/{pod_name}?match={x}"):
+        response, posted = http_reload({})
+
+    assert response.status_code == 200
+    assert posted == ["http://10.0.0.5:13133/reload/otel-pod-123?match={x}"]
@@ -0,0 +1,35 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+
+remove_configmap = getattr(agent, "__remove_configmap")
+
+
+def test_remove_keys_containing_dots():
+    """
+    Component names with dots are removed and reported as tuple paths, and the emptied parent is pruned.
+    """
+    receivers = {"otlp/v1.2": {"protocols": {"grpc": {}}}, "hostmetrics": {}}
+
+    removed = remove_configmap({"otlp/v1.2": {"protocols": {"grpc": {}}}}, receivers, ("receivers",))
+
+    assert receivers == {"hostmetrics": {}}
+    assert removed == [("receivers", "otlp/v1.2", "protocols", "grpc"), ("receivers", "otlp/v1.2", "protocols"), ("receivers", "otlp/v1.2")]
+
+
+def test_remove_list_items_and_prune_empty_parents():
+    """
+    List items are removed by value, hashable or not; lists and maps left empty are pruned in the same pass.
+    """
+    service = {"pipelines": {
+        "metrics": {"receivers": ["otlp", {"name": "custom"}, "prometheus"], "exporters": ["logging"]},
+        "logs": {"receivers": ["otlp"]},
+    }}
+
+    remove_configmap({"pipelines": {
+        "metrics": {"receivers": [{"name": "custom"}, "otlp"], "exporters": ["logging"]},
+        "logs": {"receivers": ["otlp"]},
+    }}, service, ("service",))
+
+    assert service == {"pipelines": {"metrics": {"receivers": ["prometheus"]}}}
@@ -0,0 +1,110 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import yaml
+from fastapi.testclient import TestClient
+from kubernetes import client as k8s
+from unittest.mock import patch
+
+client = TestClient(agent.app)
+
+TARGETS = """
+- name: edge
+  namespace: monitoring
+  configmap_name: edge-collector
+  key: relay
+  labels: {tier: edge, team: a}
+- name: gateway
+  namespace: observability
+  configmap_name: gateway-collector
+  labels: {tier: gateway, team: a}
+- name: operator
+  namespace: observability
+  kind: opentelemetrycollector
+  resource_name: otel
+  labels: {tier: gateway, team: b}
+"""
+
+
+class FakeCoreV1:
+    """
+    ConfigMaps keyed by (namespace, name), each holding its configuration under its own data key.
+    """
+    def __init__(self, configmaps):
+        self.configmaps = configmaps
+
+    def read_namespaced_config_map(self, name, namespace):
+        key, document = self.configmaps[(namespace, name)]
+        return k8s.V1ConfigMap(metadata=k8s.V1ObjectMeta(name=name, namespace=namespace, resource_version="1"),
+                               data={key: yaml.safe_dump(document)})
+
+    def replace_namespaced_config_map(self, name, namespace, body):
+        key = self.configmaps[(namespace, name)][0]
+        self.configmaps[(namespace, name)] = (key, yaml.safe_load(body.data[key]))
+        body.metadata.resource_version = "2"
+        return body
+
+
+class FakeCustomObjects:
+    def get_namespaced_custom_object(self, group, version, namespace, plural, name):
+        assert (group, version, plural) == ("opentelemetry.io", "v1beta1", "opentelemetrycollectors")
+        return {"spec": {"config": "receivers:\n  otlp: {}\n"}}
+
+
+def patched():
+    v1 = FakeCoreV1({
+        ("monitoring", "edge-collector"): ("relay", {"receivers": {"filelog": {}}, "processors": {}, "exporters": {}, "service": {}}),
+        ("observability", "gateway-collector"): ("collector.yaml", {"receivers": {"otlp": {}}}),
+    })
+    kube = type("FakeKube", (), {"core_v1": lambda self: v1, "custom_objects": lambda self: FakeCustomObjects()})()
+    return v1, (patch("agent.kube", kube), patch("agent.cache", agent.ConfigMapCache(kube, background=False)),
+                patch("agent.targets", agent.TargetRegistry(inline=TARGETS)))
+
+
+def test_registry_defaults_and_selectors():
+    """
+    Without configuration the default target is monitoring/collector-config; selectors match target labels.
+    """
+    assert agent.TargetRegistry().default().configmap_name == "collector-config"
+
+    registry = agent.TargetRegistry(inline=TARGETS)
+    assert [target.name for target in registry.select("team=a")] == ["edge", "gateway"]
+    assert [target.name for target in registry.select("tier=gateway,team!=a")] == ["operator"]
+    assert registry.key_for("monitoring", "edge-collector") == "relay"
+    assert registry.key_for("monitoring", "other") == "collector.yaml"
+
+
+def test_get_by_selector_reads_every_target():
+    """
+    One GET returns the configuration of every selected target, ConfigMap or OpenTelemetryCollector.
+    """
+    _, patches = patched()
+    with patches[0], patches[1], patches[2]:
+        response = client.get("/configurations", params={"selector": "tier"})
+
+    assert response.status_code == 200
+    configurations = {item["name"]: item["configuration"] for item in response.json()["targets"]}
+    assert configurations == {
+        "edge": {"receivers": {"filelog": {}}, "processors": {}, "exporters": {}, "service": {}},
+        "gateway": {"receivers": {"otlp": {}}},
+        "operator": {"receivers": {"otlp": {}}},
+    }
+
+
+def test_get_and_write_use_target_key():
+    """
+    A single target is returned as before, and writes go to the ConfigMap key of that target.
+    """
+    v1, patches = patched()
+    with patches[0], patches[1], patches[2]:
+        assert client.get("/configurations", params={"target": "edge"}).json()["receivers"] == {"filelog": {}}
+        response = client.put("/configurations", json={
+            "namespace": "monitoring", "configmap_name": "edge-collector",
+            "receivers": {"otlp": {}}, "processors": {}, "exporters": {}, "service": {},
+        })
+        unknown = client.get("/configurations", params={"target": "missing"})
+
+    assert response.status_code == 200
+    assert v1.configmaps[("monitoring", "edge-collector")] == ("relay", {"receivers": {"filelog": {}, "otlp": {}}, "processors": {}, "exporters": {}, "service": {}})
+    assert unknown.status_code == 404
@@ -0,0 +1,129 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import agent
+import copy
+from fastapi.testclient import TestClient
+from test_conflicts import ConflictingCoreV1, patched, payload
+
+client = TestClient(agent.app)
+
+
+def pipeline_document():
+    return {
+        "receivers": {"otlp": {}, "unused": {}},
+        "processors": {"batch": {}},
+        "exporters": {"logging": {}},
+        "connectors": {"forward": {}},
+        "extensions": {"health_check": {}},
+        "service": {
+            "extensions": ["health_check"],
+            "pipelines": {
+                "metrics": {"receivers": ["otlp"], "processors": ["batch"], "exporters": ["forward"]},
+                "metrics/out": {"receivers": ["forward"], "exporters": ["logging"]},
+            },
+        },
+    }
+
+
+def test_index_dangling_and_unused():
+    """
+    Connectors satisfy receiver/exporter references; unreferenced components are reported as unused.
+    """
+    document = pipeline_document()
+    document["service"]["pipelines"]["metrics"]["processors"].append("missing")
+    index = agent.ComponentIndex.build(document)
+
+    assert index.dangling() == [{"pipeline": "metrics", "section": "processors", "component": "missing"}]
+    assert index.unused() == [["receivers", "unused"]]
+
+
+def test_index_incremental_update_matches_full_build():
+    """
+    Updating the index from a diff gives the same result as rebuilding it.
+    """
+    before = pipeline_document()
+    after = copy.deepcopy(before)
+    del after["exporters"]["logging"]
+    after["receivers"]["hostmetrics"] = {}
+    after["service"]["pipelines"]["metrics"]["receivers"].append("hostmetrics")
+    del after["service"]["pipelines"]["metrics/out"]
+
+    index = agent.ComponentIndex.build(before).updated(after, agent.diff_configmap(before, after))
+    full = agent.ComponentIndex.build(after)
+
+    assert index.defined == full.defined
+    assert index.pipelines == full.pipelines
+    assert index.dangling() == []
+
+
+def test_put_rejects_dangling_reference():
+    """
+    A change that makes a pipeline reference an undefined component is rejected without writing.
+    """
+    v1 = ConflictingCoreV1(conflicts=0)
+    kube_patch, cache_patch = patched(v1)
+    request = payload()
+    request["service"] = {"pipelines": {"traces": {"receivers": ["otlp"], "exporters": ["jaeger"]}}}
+    with kube_patch, cache_patch:
+        response = client.put("/configurations", json=request)
+
+    assert response.status_code == 422
+    assert response.json()["detail"]["dangling"] == [{"pipeline": "traces", "section": "exporters", "component": "jaeger"}]
+    assert v1.replaced_with == []
+
+
+def test_put_prunes_unused_components():
+    """
+    With prune_unused, components no pipeline references are removed before writing.
+    """
+    v1 = ConflictingCoreV1(conflicts=0)
+    kube_patch, cache_patch = patched(v1)
+    request = payload(hostmetrics={})
+    request["exporters"] = {"logging": {}}
+    request["service"] = {"pipelines": {"metrics": {"receivers": ["hostmetrics"], "exporters": ["logging"]}}}
+    request["prune_unused"] = True
+    with kube_patch, cache_patch:
+        response = client.put("/configurations", json=request)
+
+    assert response.status_code == 200
+    assert set(v1.document["receivers"]) == {"hostmetrics"}
+
+
+def test_validate_is_a_dry_run():
+    """
+    /validate reports dangling references and unused components without rejecting or writing (DEBUG mode).
+    """
+    response = client.post("/validate", json={
+        "namespace": None,
+        "configmap_name": None,
+        "operation": "patch",
+        "operations": [{"op": "remove", "path": "/exporters/logging"}],
+    })
+
+    assert response.status_code == 200
+    assert response.json()["valid"] is False
+    assert response.json()["dangling"] == [{"pipeline": "metrics/fluidosmonitoring", "section": "exporters", "component": "logging"}]
+    assert response.json()["introduced"] == response.json()["dangling"]
+    assert ["receivers", "k8s_events"] in response.json()["unused"]
+
+
+def test_validate_reports_existing_problems():
+    """
+    /validate without an operation reports references that are already dangling; a change that
+    leaves them in place is not valid either, although it introduces nothing new.
+    """
+    v1 = ConflictingCoreV1(conflicts=0)
+    v1.document["service"] = {"pipelines": {"traces": {"receivers": ["zipkin"], "exporters": []}}}
+    kube_patch, cache_patch = patched(v1)
+    with kube_patch, cache_patch:
+        current = client.post("/validate", json={"namespace": "monitoring", "configmap_name": "collector-config"})
+        change = client.post("/validate", json={"namespace": "monitoring", "configmap_name": "collector-config",
+                                                "operation": "update", "configuration": {"receivers": {"hostmetrics": {}}}})
+
+    expected = [{"pipeline": "traces", "section": "receivers", "component": "zipkin"}]
+    assert current.json()["valid"] is False
+    assert current.json()["dangling"] == expected
+    assert current.json()["introduced"] == []
+    assert change.json()["valid"] is False
+    assert change.json()["introduced"] == []